@@ -0,0 +1,367 @@
+# Benchmark y comprobación de regresiones de game.logic: hand_rank,
+# best_hand, is_straight, is_flush y el reparto (make_deck/deal y Deck).
+# Recorre corpus fijos (todas las manos de 5 cartas, o una muestra con
+# semilla), comprueba la distribución exacta de categorías y compara con
+# el evaluador original como oráculo. Sale con código 1 si algo no cuadra.
+# Uso: python -m bench.evaluator [--corpus all|sample] [--hands N]
+#                                [--oracle N | --full-oracle] [--json]
+#                                [--compare anterior.json]
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from itertools import combinations, islice
+
+try:
+    import resource
+except ImportError:
+    # Windows no tiene resource: el pico de RSS sale como None
+    resource = None
+
+from game.logic import (
+    CATEGORY_NAMES, DECK_CARDS, DECK_INTS, HAND_CLASSES, NUM_HAND_CLASSES,
+    Deck, _INDEX_BUFFER, _PRODUCTS, _build_tables, _reference_hand_rank,
+    best_hand, card_ranks, class_category, class_description, class_kickers,
+    deal, evaluate5, hand_rank, is_flush, is_straight, make_deck,
+)
+
+TOTAL_HANDS = 2598960
+# Manos de 5 cartas por categoría (sobre las 2.598.960)
+EXPECTED = {
+    8: 40,
+    7: 624,
+    6: 3744,
+    5: 5108,
+    4: 10200,
+    3: 54912,
+    2: 123552,
+    1: 1098240,
+    0: 1302540,
+}
+ROYAL_FLUSHES = 4
+FLUSHES = EXPECTED[8] + EXPECTED[5]  # lo que cuenta is_flush
+STRAIGHTS = EXPECTED[8] + EXPECTED[4]  # lo que cuenta is_straight
+
+
+def corpus(kind, n, seed):
+    # devuelve una función que genera el corpus (en texto o en enteros)
+    if kind == "all":
+        return lambda cards: combinations(cards, 5)
+    rng = random.Random(seed)
+    picks = [rng.sample(range(52), 5) for _ in range(n)]
+    return lambda cards: ([cards[i] for i in p] for p in picks)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    count = fn()
+    return count, time.perf_counter() - start
+
+
+def peak_alloc(fn, args, calls=2000):
+    # memoria de trabajo de una llamada: pico de tracemalloc sobre lo que
+    # ya estaba reservado (la basura de cada llamada se libera al volver)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for a in islice(args, calls):
+        fn(a)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - base
+
+
+def table_bytes():
+    # índice mapeado (compartido entre procesos) + el dict de productos,
+    # que sí es propio de cada proceso
+    return len(_INDEX_BUFFER) + sys.getsizeof(_PRODUCTS)
+
+
+def check_index():
+    # el índice en disco debe decir lo mismo que las tablas recién
+    # construidas, también en las búsquedas inversas por fuerza
+    *_, hand_classes = _build_tables()
+    failures = []
+    if len(HAND_CLASSES) != len(hand_classes):
+        failures.append(f"índice con {len(HAND_CLASSES) - 1} clases")
+        return failures
+    for strength in range(1, len(hand_classes)):
+        category, kickers = hand_classes[strength]
+        if (HAND_CLASSES[strength] != (category, kickers)
+                or class_category(strength) != category
+                or class_kickers(strength) != kickers
+                or class_description(strength) != CATEGORY_NAMES[category]):
+            failures.append(f"la clase {strength} no coincide con las tablas")
+            break
+    return failures
+
+
+def check_batch(hands):
+    # game.batch (si hay NumPy) debe dar lo mismo que evaluate5 y rechazar
+    # con ValueError las manos imposibles en vez de devolver otra fuerza
+    try:
+        import numpy as np
+        from game.batch import encode_batch, hand_rank_batch
+    except ImportError:
+        return []
+    failures = []
+    sample = list(islice(hands(DECK_INTS), 20000))
+    got = hand_rank_batch(np.asarray(sample, dtype=np.int64))
+    if [int(s) for s in got] != [evaluate5(*h) for h in sample]:
+        failures.append("hand_rank_batch difiere de evaluate5")
+    invalid = (
+        ["AS", "AH", "AD", "AC", "AS"],  # cinco ases: producto inexistente
+        ["AS", "AS", "KS", "QS", "JS"],  # color con una carta repetida
+    )
+    for hand in invalid:
+        try:
+            hand_rank_batch(encode_batch([hand]))
+        except ValueError:
+            continue
+        failures.append(f"hand_rank_batch acepta la mano inválida {hand}")
+    try:
+        hand_rank_batch(np.zeros((1, 5), dtype=np.int64))
+        failures.append("hand_rank_batch acepta cartas mal codificadas")
+    except ValueError:
+        pass
+    return failures
+
+
+def run(kind="all", n=200000, seed=1234, oracle=200000, full_oracle=False):
+    hands = corpus(kind, n, seed)
+    failures = check_index() + check_batch(hands)
+    results = {}
+
+    def record(name, count, elapsed, peak=None):
+        results[name] = {
+            "hands": count,
+            "seconds": round(elapsed, 3),
+            "per_s": round(count / elapsed) if elapsed else None,
+        }
+        if peak is not None:
+            results[name]["peak_bytes"] = peak
+
+    # evaluador entero + distribución de categorías
+    counts = [0] * (NUM_HAND_CLASSES + 1)
+
+    def eval_ints():
+        c = 0
+        for h in hands(DECK_INTS):
+            counts[evaluate5(*h)] += 1
+            c += 1
+        return c
+
+    total, elapsed = timed(eval_ints)
+    record("evaluate5", total, elapsed,
+           peak_alloc(lambda h: evaluate5(*h), hands(DECK_INTS)))
+
+    categories = dict.fromkeys(EXPECTED, 0)
+    for strength, k in enumerate(counts[1:], start=1):
+        categories[HAND_CLASSES[strength][0]] += k
+    royals = counts[NUM_HAND_CLASSES]
+    distinct = sum(1 for k in counts[1:] if k)
+    if kind == "all":
+        if total != TOTAL_HANDS:
+            failures.append(f"se evaluaron {total} manos, no {TOTAL_HANDS}")
+        for cat, want in EXPECTED.items():
+            if categories[cat] != want:
+                failures.append(
+                    f"{CATEGORY_NAMES[cat]}: {categories[cat]} (esperado {want})"
+                )
+        if royals != ROYAL_FLUSHES:
+            failures.append(f"escaleras reales: {royals} (esperado {ROYAL_FLUSHES})")
+        if distinct != NUM_HAND_CLASSES:
+            failures.append(f"clases distintas: {distinct} (esperado {NUM_HAND_CLASSES})")
+
+    # hand_rank en texto
+    total, elapsed = timed(lambda: sum(1 for h in hands(DECK_CARDS) if hand_rank(h)))
+    record("hand_rank", total, elapsed, peak_alloc(hand_rank, hands(DECK_CARDS)))
+
+    # is_flush / is_straight
+    flushes = 0
+
+    def flush_pass():
+        nonlocal flushes
+        c = 0
+        for h in hands(DECK_CARDS):
+            flushes += is_flush(h)
+            c += 1
+        return c
+
+    total, elapsed = timed(flush_pass)
+    record("is_flush", total, elapsed, peak_alloc(is_flush, hands(DECK_CARDS)))
+
+    straights = 0
+
+    def straight_pass():
+        nonlocal straights
+        c = 0
+        for h in hands(DECK_CARDS):
+            straights += is_straight(card_ranks(h))
+            c += 1
+        return c
+
+    total, elapsed = timed(straight_pass)
+    record("is_straight", total, elapsed,
+           peak_alloc(lambda h: is_straight(card_ranks(h)), hands(DECK_CARDS)))
+    if kind == "all":
+        if flushes != FLUSHES:
+            failures.append(f"is_flush: {flushes} (esperado {FLUSHES})")
+        if straights != STRAIGHTS:
+            failures.append(f"is_straight: {straights} (esperado {STRAIGHTS})")
+
+    # oráculo: evaluador original contra el de tablas
+    limit = None if full_oracle else oracle
+    mismatches = 0
+
+    def oracle_pass():
+        nonlocal mismatches
+        c = 0
+        for h in islice(hands(DECK_CARDS), limit):
+            if _reference_hand_rank(h) != hand_rank(h):
+                mismatches += 1
+            c += 1
+        return c
+
+    total, elapsed = timed(oracle_pass)
+    record("oracle", total, elapsed)
+    if mismatches:
+        failures.append(f"hand_rank difiere del oráculo en {mismatches} manos")
+
+    # best_hand: mesas de 4 jugadores con semilla, contra el oráculo
+    rng = random.Random(seed)
+    tables = []
+    for _ in range(20000):
+        deck = make_deck()
+        rng.shuffle(deck)
+        tables.append({f"j{i}": deal(deck, 5) for i in range(4)})
+    wrong = 0
+
+    def best_pass():
+        nonlocal wrong
+        for table in tables:
+            score, winners = best_hand(table)
+            top = max(_reference_hand_rank(c) for c in table.values())
+            want = [p for p, c in table.items() if _reference_hand_rank(c) == top]
+            if score != top or winners != want:
+                wrong += 1
+        return len(tables)
+
+    best_pass()
+    start = time.perf_counter()
+    for table in tables:
+        best_hand(table)
+    record("best_hand", len(tables), time.perf_counter() - start)
+    if wrong:
+        failures.append(f"best_hand difiere del oráculo en {wrong} mesas")
+
+    # reparto: mazo nuevo + shuffle + deal frente al Deck reutilizable
+    def old_deal():
+        r = random.Random(seed)
+        for _ in range(50000):
+            deck = make_deck()
+            r.shuffle(deck)
+            for _ in range(4):
+                deal(deck, 5)
+        return 50000
+
+    def new_deal():
+        deck = Deck(random.Random(seed))
+        for _ in range(50000):
+            deck.reset()
+            for _ in range(4):
+                deck.deal(5)
+        return 50000
+
+    record("make_deck+deal", *timed(old_deal))
+    record("Deck.deal", *timed(new_deal))
+
+    return {
+        "corpus": kind,
+        "hands": n if kind == "sample" else TOTAL_HANDS,
+        "seed": seed,
+        "categories": {
+            CATEGORY_NAMES[c]: categories[c] for c in sorted(categories, reverse=True)
+        },
+        "royal_flushes": royals,
+        "distinct_classes": distinct,
+        "oracle_checked": results["oracle"]["hands"],
+        "benchmarks": results,
+        "memory": {
+            "tables_bytes": table_bytes(),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "failures": failures,
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def compare(result, previous):
+    # ratio de velocidad por benchmark respecto a una ejecución anterior
+    lines = []
+    for name, now in result["benchmarks"].items():
+        before = previous.get("benchmarks", {}).get(name)
+        if not before or not before.get("per_s") or not now.get("per_s"):
+            continue
+        lines.append(f"  {name:16s} x{now['per_s'] / before['per_s']:.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del evaluador de manos")
+    parser.add_argument("--corpus", choices=("all", "sample"), default="all")
+    parser.add_argument("--hands", type=int, default=200000,
+                        help="tamaño de la muestra con --corpus sample")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--oracle", type=int, default=200000,
+                        help="manos comparadas con el evaluador original")
+    parser.add_argument("--full-oracle", action="store_true",
+                        help="compara todo el corpus con el evaluador original")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="salida --json de una ejecución anterior")
+    args = parser.parse_args()
+
+    result = run(args.corpus, args.hands, args.seed, args.oracle, args.full_oracle)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"corpus: {result['corpus']} ({result['hands']:,} manos), "
+              f"semilla {result['seed']}")
+        for name, count in result["categories"].items():
+            print(f"  {name:18s} {count:10,d}")
+        print(f"  escaleras reales   {result['royal_flushes']:10,d}")
+        print(f"clases distintas: {result['distinct_classes']}, "
+              f"oráculo: {result['oracle_checked']:,} manos")
+        for name, b in result["benchmarks"].items():
+            peak = b.get("peak_bytes")
+            peak = f"  pico {peak:6d} B" if peak is not None else ""
+            print(f"  {name:16s} {b['per_s']:12,d} /s{peak}")
+        mem = result["memory"]
+        rss = mem["peak_rss_mb"]
+        rss = f"{rss} MiB" if rss is not None else "n/d"
+        print(f"tablas: {mem['tables_bytes'] / 1024:.0f} KiB, pico RSS: {rss}")
+        for failure in result["failures"]:
+            print("FALLO:", failure)
+        if not result["failures"]:
+            print("OK")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"respecto a {args.compare}:", file=sys.stderr)
+        for line in compare(result, previous):
+            print(line, file=sys.stderr)
+
+    sys.exit(1 if result["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
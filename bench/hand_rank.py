@@ -0,0 +1,53 @@
+# Micro-benchmark del evaluador de manos.
+# Uso: python -m bench.hand_rank [n_manos]
+import random
+import sys
+import time
+
+from game.logic import (
+    make_deck, hand_rank, _reference_hand_rank, encode_hand, evaluate5,
+)
+
+
+def sample_hands(n, seed=1234):
+    rng = random.Random(seed)
+    deck = make_deck()
+    return [rng.sample(deck, 5) for _ in range(n)]
+
+
+def measure(fn, hands):
+    start = time.perf_counter()
+    for h in hands:
+        fn(h)
+    elapsed = time.perf_counter() - start
+    return len(hands) / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    hands = sample_hands(n)
+    encoded = [encode_hand(h) for h in hands]
+
+    before = measure(_reference_hand_rank, hands)
+    after = measure(hand_rank, hands)
+    raw = measure(lambda h: evaluate5(*h), encoded)
+
+    print(f"manos evaluadas: {n}")
+    print(f"antes  (Counter/sort, texto): {before:12,.0f} eval/s")
+    print(f"ahora  (tablas, texto):       {after:12,.0f} eval/s  x{after / before:.1f}")
+    print(f"ahora  (tablas, enteros):     {raw:12,.0f} eval/s  x{raw / before:.1f}")
+
+    try:
+        import numpy as np
+        from game.batch import hand_rank_batch
+    except ImportError:
+        return
+    arr = np.asarray(encoded, dtype=np.int64)
+    start = time.perf_counter()
+    hand_rank_batch(arr)
+    batch = n / (time.perf_counter() - start)
+    print(f"lote   (NumPy, enteros):      {batch:12,.0f} eval/s  x{batch / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# Generador de carga: N bots sin interfaz (NetClient) contra un servidor
+# local. Cada bot hace hello -> join_game -> draw, charla de vez en cuando
+# y vuelve a pedir mesa tras cada showdown. Informa de rondas por segundo,
+# latencia draw -> showdown y CPU/memoria del servidor.
+# Con --slow-readers, al acabar la medición se fuerzan traspasos entre
+# workers a clientes que no leen (ver slow_handover).
+# Uso: python -m bench.load [--bots 40] [--seconds 20] [--mode async]
+#                           [--workers N] [--slow-readers N] [--seed 1]
+#                           [--json]
+# Con la misma semilla se repiten las decisiones de los bots y el barajado
+# del servidor (--seed), así las diferencias entre commits son del código.
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from game.equity import default_discard
+from net.client import NetClient
+from net.protocol import JSON
+from server import HANDOVER_TIMEOUT
+
+
+class Bot:
+    def __init__(self, nick, rng, chat_rate=0.1, compact=True):
+        self.nick = nick
+        self.rng = rng
+        self.chat_rate = chat_rate
+        self.client = NetClient(compact=compact, reconnect=False)
+        self.inbox = self.client.subscribe("hand", "showdown")
+        self.measure_from = float("inf")
+        self.latencies = []
+        self.rounds = set()
+        self.drew_at = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self, host, port):
+        self.client.connect(host, port, self.nick)
+        self.client.send({"type": "join_game"})
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.client.close()
+
+    def _choose(self, cards):
+        # casi siempre la estrategia de los rivales simulados; a veces un
+        # descarte al azar para variar las manos
+        if self.rng.random() < 0.8:
+            return default_discard(cards)
+        return sorted(self.rng.sample(range(5), self.rng.randint(0, 3)))
+
+    def _run(self):
+        while not self.stopped.is_set():
+            msg = self.inbox.get(timeout=0.2)
+            if msg is None:
+                if not self.client.running:
+                    return
+                continue
+            now = time.perf_counter()
+            if msg["type"] == "hand" and msg.get("can_draw"):
+                self.drew_at = now
+                self.client.send({"type": "draw", "cards": self._choose(msg["cards"])})
+                if self.rng.random() < self.chat_rate:
+                    self.client.send({"type": "chat", "msg": f"suerte ({self.nick})"})
+            elif msg["type"] == "showdown":
+                if self.drew_at is not None and self.drew_at >= self.measure_from:
+                    self.latencies.append(now - self.drew_at)
+                    # una ronda se identifica por las manos reveladas
+                    self.rounds.add(tuple(sorted(
+                        (n, tuple(c)) for n, c in msg.get("hands", {}).items()
+                    )))
+                self.drew_at = None
+                self.client.send({"type": "join_game"})  # siguiente ronda
+
+
+def open_raw(host, port, nick, session=None, rcvbuf=None):
+    # conexión JSON a mano (sin hilo lector); devuelve el socket y el token
+    sock = socket.socket()
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.settimeout(5.0)
+    sock.connect((host, port))
+    hello = {"type": "hello", "nick": nick}
+    if session:
+        hello["session"] = session
+    sock.sendall(JSON.encode(hello))
+    rfile = sock.makefile("rb")
+    token = None
+    while True:
+        msg = JSON.read(rfile)
+        if msg.get("type") == "session":
+            token = msg["token"]
+        elif msg.get("type") == "rooms":
+            return sock, token
+
+
+def token_worker(token):
+    # los tokens llevan delante el worker que los emitió
+    return int(token.partition(".")[0])
+
+
+def closed_by_server(sock):
+    # vacía el socket: True si el servidor lo cerró, False si sigue abierto
+    # (en silencio o aún recibiendo al cabo de unos segundos)
+    sock.settimeout(1.0)
+    deadline = time.monotonic() + 5.0
+    try:
+        while time.monotonic() < deadline:
+            if not sock.recv(1 << 16):
+                return True
+    except ConnectionError:
+        return True
+    except socket.timeout:
+        pass
+    return False
+
+
+def slow_handover(host, port, count, megabytes=4.0):
+    # Cada lector lento está en el vestíbulo de un worker con la ventana de
+    # recepción mínima y sin leer; un charlatán llena el vestíbulo con
+    # `megabytes` de chat para que el servidor tenga mucho pendiente para
+    # él. Después el lector reanuda la sesión de un "dueño" que vive en
+    # otro worker, lo que obliga a traspasar su socket: el servidor debe
+    # rendirse tras HANDOVER_TIMEOUT y cortarlo, no quedarse esperando.
+    readers = []
+    for i in range(count):
+        sock, token = open_raw(host, port, f"lento{i:02d}", rcvbuf=4096)
+        while True:
+            owner, owner_token = open_raw(host, port, f"dueño{i:02d}")
+            owner.close()  # la sesión sigue viva durante el periodo de gracia
+            if token_worker(owner_token) != token_worker(token):
+                break
+        readers.append((sock, f"dueño{i:02d}", owner_token))
+
+    chatter = NetClient(reconnect=False)
+    chatter.connect(host, port, "charlatán")
+    text = "x" * 60000
+    for _ in range(int(megabytes * 1e6 / len(text))):
+        chatter.send({"type": "chat", "msg": text})
+    time.sleep(1.0)
+
+    for sock, nick, token in readers:
+        sock.sendall(JSON.encode({"type": "hello", "nick": nick, "session": token}))
+    time.sleep(HANDOVER_TIMEOUT + 1.0)
+    closed = sum(closed_by_server(sock) for sock, _, _ in readers)
+    for sock, _, _ in readers:
+        sock.close()
+    chatter.close()
+    return {"readers": count, "closed": closed, "open": count - closed}
+
+
+def proc_tree(pid):
+    # el proceso y sus hijos (los workers de --workers), vía /proc
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [pid] + [int(c) for c in f.read().split()]
+    except OSError:
+        return [pid]
+
+
+def tree_stats(pid):
+    # proc_stats sumado sobre el proceso y sus hijos
+    cpu = rss = peak = 0
+    for p in proc_tree(pid):
+        c, r, h = proc_stats(p)
+        if c is None:
+            continue
+        cpu += c
+        rss += r or 0
+        peak += h or 0
+    return cpu, rss, peak
+
+
+def proc_stats(pid):
+    # CPU (segundos de usuario + sistema) y memoria del proceso, vía /proc
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        mem = {}
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    mem[key] = int(value.split()[0]) / 1024
+        return cpu, mem.get("VmRSS"), mem.get("VmHWM")
+    except (OSError, ValueError, IndexError):
+        return None, None, None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(bots=40, seconds=20.0, mode="async", seed=1, warmup=2.0,
+        chat_rate=0.1, compact=True, server=None, workers=1, slow_readers=0):
+    # server=(host, port) usa un servidor ya arrancado (sin datos de CPU)
+    proc = None
+    # la salida del servidor va a un fichero: de ahí salen los traspasos
+    # fallidos (una tubería sin leer acabaría bloqueándolo)
+    log = tempfile.TemporaryFile(mode="w+")
+    if server is None:
+        host, port = "127.0.0.1", free_port()
+        proc = subprocess.Popen(
+            [sys.executable, "server.py", "--host", host, "--port", str(port),
+             "--mode", mode, "--seed", str(seed), "--workers", str(workers)],
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection((host, port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.time() > deadline or proc.poll() is not None:
+                    proc.kill()
+                    raise SystemExit("el servidor no arrancó")
+                time.sleep(0.05)
+    else:
+        host, port = server
+
+    rng = random.Random(seed)
+    fleet = [
+        Bot(f"bot{i:04d}", random.Random(rng.getrandbits(64)), chat_rate, compact)
+        for i in range(bots)
+    ]
+    try:
+        for bot in fleet:
+            bot.start(host, port)
+        time.sleep(warmup)
+
+        start = time.perf_counter()
+        cpu0 = tree_stats(proc.pid)[0] if proc else None
+        for bot in fleet:
+            bot.measure_from = start
+        time.sleep(seconds)
+        elapsed = time.perf_counter() - start
+        cpu1, rss, peak = tree_stats(proc.pid) if proc else (None, None, None)
+        slow = slow_handover(host, port, slow_readers) if slow_readers else None
+        disconnected = sum(not bot.client.running for bot in fleet)
+    finally:
+        for bot in fleet:
+            bot.stop()
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        log.seek(0)
+        failed = sum("No se pudo pasar" in line for line in log)
+        log.close()
+
+    latencies = [x for bot in fleet for x in bot.latencies]
+    rounds = set().union(*(bot.rounds for bot in fleet))
+    result = {
+        "bots": bots,
+        "mode": mode,
+        "workers": workers,
+        "seed": seed,
+        "seconds": round(elapsed, 2),
+        "rounds": len(rounds),
+        "rounds_per_s": round(len(rounds) / elapsed, 2),
+        "disconnected": disconnected,
+    }
+    if slow is not None:
+        slow["failed_handovers"] = failed if proc else None
+        result["slow_readers"] = slow
+    if latencies:
+        result["draw_to_showdown_ms"] = {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+        }
+    if cpu0 is not None and cpu1 is not None:
+        result["server"] = {
+            "cpu_percent": round((cpu1 - cpu0) / elapsed * 100, 1),
+            "rss_mb": round(rss, 1) if rss else None,
+            "peak_rss_mb": round(peak, 1) if peak else None,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor")
+    parser.add_argument("--bots", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--mode", choices=("async", "threaded"), default="async")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="procesos del servidor (--workers del servidor)")
+    parser.add_argument("--slow-readers", type=int, default=0,
+                        help="traspasos a clientes que no leen, tras la medición")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chat-rate", type=float, default=0.1,
+                        help="probabilidad de que un bot escriba en cada ronda")
+    parser.add_argument("--json-protocol", action="store_true",
+                        help="los bots no negocian el protocolo binario")
+    parser.add_argument("--server", metavar="HOST:PORT",
+                        help="usar un servidor ya arrancado")
+    parser.add_argument("--json", action="store_true",
+                        help="salida en una línea JSON")
+    args = parser.parse_args()
+    if args.slow_readers and args.workers < 2 and not args.server:
+        parser.error("--slow-readers necesita --workers 2 o más")
+
+    server = None
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        server = (host or "127.0.0.1", int(port))
+    result = run(args.bots, args.seconds, args.mode, args.seed, args.warmup,
+                 args.chat_rate, not args.json_protocol, server, args.workers,
+                 args.slow_readers)
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"{result['bots']} bots, servidor {result['mode']} "
+          f"x{result['workers']}, "
+          f"semilla {result['seed']}, {result['seconds']} s")
+    print(f"rondas: {result['rounds']} ({result['rounds_per_s']}/s), "
+          f"desconectados: {result['disconnected']}")
+    lat = result.get("draw_to_showdown_ms")
+    if lat:
+        print(f"draw -> showdown: p50 {lat['p50']} ms, p99 {lat['p99']} ms, "
+              f"media {lat['mean']} ms")
+    slow = result.get("slow_readers")
+    if slow:
+        print(f"lectores lentos: {slow['readers']}, cortados por el servidor: "
+              f"{slow['closed']}, abiertos: {slow['open']}, "
+              f"traspasos fallidos: {slow['failed_handovers']}")
+    srv = result.get("server")
+    if srv:
+        print(f"servidor: CPU {srv['cpu_percent']}%, RSS {srv['rss_mb']} MiB "
+              f"(pico {srv['peak_rss_mb']} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Compara los códecs JSON y binario: bytes por ronda y mensajes por segundo.
+# Los mensajes salen de una GameRoom de verdad (state_delta, no game_state
+# completos), contados por destinatario: lo que el servidor escribe.
+# Uso: python -m bench.protocol [jugadores]
+import io
+import random
+import sys
+import time
+
+import server
+from net.protocol import JSON, BINARY
+
+
+def round_messages(players, rng, rounds=2):
+    # (destinatario, mensaje) de la última de `rounds` rondas en una mesa:
+    # cada jugador vuelve a pedir mesa tras el showdown (como los bots de
+    # bench.load), cambia dos cartas y escribe una vez en el chat. La
+    # primera ronda, con las entradas a la mesa, no se cuenta.
+    sent = []
+    saved = server.send_to_nick, server.broadcast_to, server.DRAW_TIMEOUT
+    server.send_to_nick = lambda nick, obj: sent.append((nick, obj))
+    server.broadcast_to = lambda nicks, obj: sent.extend((n, obj) for n in list(nicks))
+    server.DRAW_TIMEOUT = 0
+    try:
+        room = server.GameRoom(1, rng)
+        for _ in range(rounds):
+            sent.clear()
+            for p in players:
+                room.add_player(p)
+            for p in players:
+                room.player_draw(p, sorted(rng.sample(range(5), 2)))
+                chat = {"type": "chat", "from": p, "msg": "suerte a todos"}
+                sent.extend((q, chat) for q in players)
+            if room.phase == "draw":
+                # quien entró con la ronda empezada no tiene mano: se
+                # cierra como lo haría DRAW_TIMEOUT
+                room.draw_deadline(room.round_number)
+    finally:
+        server.send_to_nick, server.broadcast_to, server.DRAW_TIMEOUT = saved
+    return sent
+
+
+def measure(codec, msgs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for m in msgs:
+            codec.encode(m)
+    enc = len(msgs) * repeat / (time.perf_counter() - start)
+
+    frames = [codec.encode(m) for m in msgs]
+    stream = b"".join(frames)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f = io.BytesIO(stream)
+        for _ in frames:
+            codec.read(f)
+    dec = len(msgs) * repeat / (time.perf_counter() - start)
+    return sum(len(f) for f in frames), enc, dec
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    players = [f"jugador{i}" for i in range(1, n + 1)]
+    sent = round_messages(players, random.Random(42))
+    msgs = [m for _, m in sent]
+    kinds = {}
+    for m in msgs:
+        kinds[m["type"]] = kinds.get(m["type"], 0) + 1
+    print(f"{len(msgs)} mensajes por ronda, {n} jugadores: "
+          + ", ".join(f"{k} {v}" for k, v in sorted(kinds.items())))
+    results = {}
+    for name, codec in (("json", JSON), ("binario", BINARY)):
+        size, enc, dec = measure(codec, msgs, 2000)
+        results[name] = size
+        print(f"{name:8s} {size:6d} bytes/ronda  "
+              f"codificar {enc:10,.0f} msg/s  decodificar {dec:10,.0f} msg/s")
+    print(f"ahorro: {1 - results['binario'] / results['json']:.0%}")
+    # un resync cuesta una instantánea completa por jugador que lo pida
+    state = next(m for _, m in sent if m["type"] == "game_state")
+    print(f"resync (game_state): json {len(JSON.encode(state))} bytes, "
+          f"binario {len(BINARY.encode(state))} bytes")
+
+
+if __name__ == "__main__":
+    main()
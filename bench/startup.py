@@ -0,0 +1,83 @@
+# Tiempo hasta el primer frame del cliente, medido desde fuera (incluye
+# arrancar el intérprete) y desde dentro (desde el import de main).
+# Uso: python -m bench.startup [ejecuciones] [--record archivo.jsonl]
+# Con --record se añade una línea por ejecución del benchmark al archivo
+# para seguir la evolución entre commits.
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HISTORY = "bench/startup.jsonl"
+
+
+def probe():
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py", "--startup-probe"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env,
+    )
+    result = {}
+    for line in proc.stdout:
+        key, _, value = line.partition(" ")
+        if key == "first_frame":
+            result["wall"] = time.perf_counter() - start
+            result["first_frame"] = float(value)
+        elif key == "warm_up":
+            result["warm_up"] = float(value)
+    proc.wait()
+    if "wall" not in result:
+        raise SystemExit("el cliente no llegó a dibujar el primer frame")
+    return result
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = sys.argv[1:]
+    record = None
+    if "--record" in args:
+        i = args.index("--record")
+        record = args[i + 1] if i + 1 < len(args) else HISTORY
+        del args[i:i + 2]
+    runs = int(args[0]) if args else 5
+
+    samples = [probe() for _ in range(runs)]
+    summary = {
+        key: round(statistics.median(s[key] for s in samples), 4)
+        for key in ("wall", "first_frame", "warm_up")
+    }
+    print(f"{runs} ejecuciones (mediana)")
+    print(f"primer frame, desde el proceso: {summary['wall'] * 1000:7.1f} ms")
+    print(f"primer frame, desde main:       {summary['first_frame'] * 1000:7.1f} ms")
+    print(f"precarga terminada:             {summary['warm_up'] * 1000:7.1f} ms")
+
+    if record:
+        entry = dict(summary, rev=revision(), runs=runs,
+                     time=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        previous = None
+        if os.path.exists(record):
+            with open(record, encoding="utf-8") as f:
+                lines = [l for l in f if l.strip()]
+            if lines:
+                previous = json.loads(lines[-1])
+        with open(record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        if previous:
+            delta = (summary["wall"] - previous["wall"]) * 1000
+            print(f"respecto a {previous.get('rev')}: {delta:+.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Compara la ruta clásica (make_surface + smoothscale por frame) con la de
+# superficies reservadas: frames por segundo y superficies creadas por
+# segundo. Uso: python -m bench.video [video] [segundos]
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from main import VideoDecoder
+
+
+def measure(path, size, zero_copy, seconds):
+    dec = VideoDecoder(path, size, zero_copy=zero_copy)
+    dec.start()
+    while dec.duration == 0 and dec.error is None:
+        time.sleep(0.01)
+    base = dec.allocated
+    frames = 0
+    loop = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds and dec.error is None:
+        # consume tan rápido como decodifica: cada frame es la vuelta
+        # siguiente, nunca hay frames tardíos
+        with dec.cond:
+            ready = bool(dec.frames)
+            if ready:
+                loop = dec.frames[0][0]
+                t = dec.frames[0][1]
+        if not ready:
+            time.sleep(0.0005)
+            continue
+        if dec.frame_at(loop, t) is not None:
+            frames += 1
+    elapsed = time.perf_counter() - start
+    allocated = dec.allocated - base
+    dec.stop()
+    if dec.error is not None:
+        raise SystemExit(f"error al decodificar: {dec.error}")
+    return frames / elapsed, allocated / elapsed
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "assets/video/promo.mp4"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    size = (640, 360)
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    mib = size[0] * size[1] * 4 / (1 << 20)
+    print(f"{path} -> {size[0]}x{size[1]}, {seconds:.0f} s por modo")
+    for name, zero_copy in (("clásico", False), ("sin copia", True)):
+        fps, allocs = measure(path, size, zero_copy, seconds)
+        print(f"{name:10s} {fps:7.1f} frames/s  {allocs:7.1f} superficies/s "
+              f"(~{allocs * mib:6.1f} MiB/s)")
+
+
+if __name__ == "__main__":
+    main()
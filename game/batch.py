@@ -0,0 +1,58 @@
+import numpy as np
+
+from game.logic import CARD_INT, _INDEX
+
+# Mismas tablas que game.logic, leídas del índice mapeado en memoria.
+# Las dos tablas por máscara se ensanchan porque se indexan en bloque;
+# las de productos (ya ordenadas) y categorías se usan sin copiar.
+FLUSH_TABLE = np.asarray(_INDEX["flush"], dtype=np.int32)
+UNIQUE_TABLE = np.asarray(_INDEX["unique"], dtype=np.int32)
+_PRODUCT_KEYS = np.frombuffer(_INDEX["prodkeys"], dtype=np.uint32)
+_PRODUCT_VALUES = np.frombuffer(_INDEX["prodvals"], dtype=np.uint16)
+CATEGORY_TABLE = np.frombuffer(_INDEX["category"], dtype=np.uint8)
+
+
+def encode_batch(hands):
+    # lista de manos en texto -> array (N, 5) de enteros Cactus Kev
+    return np.asarray(
+        [[CARD_INT[c] for c in hand] for hand in hands], dtype=np.int64
+    ).reshape(-1, 5)
+
+
+def hand_rank_batch(cards):
+    # ValueError si alguna fila no es una mano válida (como evaluate5, que
+    # falla con KeyError): nunca se devuelve la fuerza de otra mano
+    cards = np.asarray(cards, dtype=np.int64)
+    if cards.ndim != 2 or cards.shape[1] != 5:
+        raise ValueError("se esperaba un array de forma (N, 5)")
+
+    rank_bits = np.bitwise_or.reduce(cards, axis=1) >> 16
+    if rank_bits.size and (rank_bits.min() < 0 or rank_bits.max() >= FLUSH_TABLE.size):
+        raise ValueError("cartas mal codificadas")
+    flush_mask = (np.bitwise_and.reduce(cards, axis=1) & 0xF000) != 0
+
+    # Escaleras y cartas altas (5 valores distintos) salen directo de la
+    # máscara de bits; el color solo cambia de tabla.
+    result = np.where(
+        flush_mask, FLUSH_TABLE[rank_bits], UNIQUE_TABLE[rank_bits]
+    )
+
+    paired = result == 0
+    if paired.any():
+        # un color con valores repetidos solo sale con cartas duplicadas
+        if (paired & flush_mask).any():
+            raise ValueError("mano inválida (cartas repetidas)")
+        sub = cards[paired]
+        # manos con valores repetidos: producto de primos -> tabla ordenada
+        products = np.prod(sub & 0xFF, axis=1)
+        idx = np.minimum(
+            np.searchsorted(_PRODUCT_KEYS, products), _PRODUCT_KEYS.size - 1
+        )
+        if (_PRODUCT_KEYS[idx] != products).any():
+            raise ValueError("mano inválida (producto de primos desconocido)")
+        result[paired] = _PRODUCT_VALUES[idx]
+    return result
+
+
+def hand_category_batch(cards):
+    return CATEGORY_TABLE[hand_rank_batch(cards)]
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from itertools import combinations, permutations
+
+from game.logic import SUITS, CARD_INT, make_deck, evaluate5
+
+MAX_DRAW = 3
+CACHE_SIZE = 4096
+
+# Los 26 descartes legales (posiciones 0..4): 1 + 5 + 10 + 10
+DISCARD_SETS = [
+    c for k in range(MAX_DRAW + 1) for c in combinations(range(5), k)
+]
+
+_SUIT_PERMS = [dict(zip(SUITS, p)) for p in permutations(SUITS)]
+# Tablas exactas por mano canónica, de la menos a la más usada (LRU): un
+# acierto la pasa al final y al llenarse se descarta la primera. El
+# cálculo va fuera del cerrojo; solo se protege la caché, que usan a la
+# vez la interfaz y el hilo que resuelve en segundo plano.
+_exact_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def canonical(hand):
+    # Forma canónica bajo permutaciones de palo: la menor de las 24
+    # reetiquetas, ordenada. Devuelve (clave, posiciones) donde
+    # posiciones[i] es el índice de hand[i] dentro de la clave.
+    best = None
+    for perm in _SUIT_PERMS:
+        cards = sorted(c[0] + perm[c[1]] for c in hand)
+        if best is None or cards < best[0]:
+            best = (cards, perm)
+    cards, perm = best
+    positions = [cards.index(c[0] + perm[c[1]]) for c in hand]
+    return tuple(cards), positions
+
+
+def _split(hand, discard):
+    kept = [CARD_INT[c] for i, c in enumerate(hand) if i not in discard]
+    deck = [CARD_INT[c] for c in make_deck() if c not in hand]
+    return kept, deck
+
+
+def _exact_table(key):
+    # fuerza media (1..7462) de cada descarte sobre la mano canónica `key`
+    with _cache_lock:
+        table = _exact_cache.get(key)
+        if table is not None:
+            _exact_cache.move_to_end(key)
+            return table
+    table = {}
+    for discard in DISCARD_SETS:
+        kept, deck = _split(key, discard)
+        total = 0
+        n = 0
+        for draw in combinations(deck, len(discard)):
+            total += evaluate5(*kept, *draw)
+            n += 1
+        table[discard] = total / n
+    with _cache_lock:
+        _exact_cache[key] = table
+        if len(_exact_cache) > CACHE_SIZE:
+            _exact_cache.popitem(last=False)
+    return table
+
+
+def _ranked(evs):
+    # mejor ev primero; a igualdad, el descarte más corto
+    return sorted(evs.items(), key=lambda x: (-x[1], len(x[0]), x[0]))
+
+
+def solve(hand):
+    # Valor esperado exacto de los 26 descartes, del mejor al peor, como
+    # lista de (posiciones, ev) sobre la mano original
+    key, positions = canonical(hand)
+    back = {p: i for i, p in enumerate(positions)}
+    evs = {
+        tuple(sorted(back[p] for p in discard)): ev
+        for discard, ev in _exact_table(key).items()
+    }
+    return _ranked(evs)
+
+
+def solve_sampled(hand, budget=0.010, step=16, rng=None):
+    # Estimación por muestreo: reparte rondas de `step` robos por descarte
+    # hasta agotar `budget` segundos (al menos una ronda)
+    rng = rng or random
+    splits = {d: _split(hand, d) for d in DISCARD_SETS}
+    totals = dict.fromkeys(DISCARD_SETS, 0)
+    rounds = 0
+    deadline = time.perf_counter() + budget
+    while True:
+        for discard, (kept, deck) in splits.items():
+            k = len(discard)
+            if k == 0:
+                continue
+            total = 0
+            for _ in range(step):
+                total += evaluate5(*kept, *rng.sample(deck, k))
+            totals[discard] += total
+        rounds += 1
+        if time.perf_counter() >= deadline:
+            break
+    n = rounds * step
+    evs = {d: totals[d] / n for d in DISCARD_SETS if d}
+    evs[()] = float(evaluate5(*splits[()][0]))
+    return _ranked(evs)
+
+
+def is_solved(hand):
+    return canonical(hand)[0] in _exact_cache
+
+
+def best_discard(hand, budget=0.010, rng=None):
+    # Vía rápida para la interfaz y los bots: tabla exacta si la mano (o
+    # una isomorfa) ya se resolvió; si no, muestreo acotado a `budget`
+    # para caber en un frame a 60 FPS. Devuelve (descarte, ev, exacto).
+    if is_solved(hand):
+        discard, ev = solve(hand)[0]
+        return discard, ev, True
+    discard, ev = solve_sampled(hand, budget, rng=rng)[0]
+    return discard, ev, False
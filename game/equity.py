@@ -0,0 +1,154 @@
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game.logic import Deck, RANK_VALUE, hand_strength
+
+MAX_DRAW = 3
+# Cada rival gasta hasta 5 + MAX_DRAW cartas del mazo de 47 (el nuestro
+# sin nuestra mano) y nosotros hasta MAX_DRAW: caben 5 rivales.
+MAX_OPPONENTS = (52 - 5 - MAX_DRAW) // (5 + MAX_DRAW)
+
+
+def default_discard(cards):
+    # Estrategia simple para los rivales: conserva cartas repetidas; si no
+    # hay ninguna, conserva las dos más altas. Nunca más de MAX_DRAW.
+    ranks = [c[0] for c in cards]
+    keep = [i for i, r in enumerate(ranks) if ranks.count(r) > 1]
+    if not keep:
+        order = sorted(range(5), key=lambda i: RANK_VALUE[ranks[i]], reverse=True)
+        keep = order[:2]
+    return [i for i in range(5) if i not in keep][:MAX_DRAW]
+
+
+def _check_opponents(opponents):
+    if not 1 <= opponents <= MAX_OPPONENTS:
+        raise ValueError(
+            f"opponents debe estar entre 1 y {MAX_OPPONENTS}, no {opponents}"
+        )
+
+
+def simulate(hand, opponents, discard, iterations, seed):
+    # Devuelve (ganadas, empatadas, jugadas) para `iterations` rondas
+    _check_opponents(opponents)
+    rng = random.Random(seed)
+    hand = list(hand)
+    discard = sorted(set(i for i in discard if 0 <= i < 5))[:MAX_DRAW]
+    deck = Deck(rng, exclude=hand)
+    wins = ties = 0
+
+    for _ in range(iterations):
+        # solo se barajan las cartas que se llegan a repartir
+        deck.reset()
+        opp_hands = [deck.deal(5) for _ in range(opponents)]
+
+        mine = hand[:]
+        for i, card in zip(discard, deck.deal(len(discard))):
+            mine[i] = card
+        me = hand_strength(mine)
+
+        best = 0
+        for cards in opp_hands:
+            swap = default_discard(cards)
+            for i, card in zip(swap, deck.deal(len(swap))):
+                cards[i] = card
+            s = hand_strength(cards)
+            if s > best:
+                best = s
+
+        if me > best:
+            wins += 1
+        elif me == best:
+            ties += 1
+    return wins, ties, iterations
+
+
+class EquityResult:
+    def __init__(self, wins=0, ties=0, total=0):
+        self.wins = wins
+        self.ties = ties
+        self.total = total
+
+    def copy(self):
+        return EquityResult(self.wins, self.ties, self.total)
+
+    def add(self, wins, ties, total):
+        self.wins += wins
+        self.ties += ties
+        self.total += total
+
+    @property
+    def win(self):
+        return self.wins / self.total if self.total else 0.0
+
+    @property
+    def tie(self):
+        return self.ties / self.total if self.total else 0.0
+
+    @property
+    def equity(self):
+        # los empates cuentan como medio bote
+        return self.win + self.tie / 2
+
+    def margin(self, z=1.96):
+        # semiamplitud del intervalo de confianza de `equity` (de Wilson:
+        # con p = 0 o 1 no se hace cero, así una primera tanda sin
+        # victorias o sin derrotas no parece más precisa de lo que es)
+        if not self.total:
+            return 1.0
+        n = self.total
+        p = self.equity
+        return z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+
+    def __repr__(self):
+        return (
+            f"EquityResult(win={self.win:.4f}, tie={self.tie:.4f}, "
+            f"n={self.total}, ±{self.margin():.4f})"
+        )
+
+
+def iter_equity(hand, opponents=1, discard=(), iterations=20000,
+                chunk=2000, workers=None, seed=None):
+    # Genera resultados parciales (copias: quien los guarde no los ve
+    # cambiar) a medida que terminan los lotes. Con workers=0 todo corre en el hilo que llama (útil desde la interfaz).
+    _check_opponents(opponents)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(32)
+    shards = []
+    left = iterations
+    while left > 0:
+        n = min(chunk, left)
+        shards.append((list(hand), opponents, list(discard), n, seed + len(shards)))
+        left -= n
+
+    result = EquityResult()
+    if workers == 0:
+        for args in shards:
+            result.add(*simulate(*args))
+            yield result.copy()
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate, *args) for args in shards]
+        try:
+            for fut in as_completed(futures):
+                result.add(*fut.result())
+                yield result.copy()
+        finally:
+            for fut in futures:
+                fut.cancel()
+
+
+def estimate_equity(hand, opponents=1, discard=(), iterations=20000,
+                    chunk=2000, workers=None, seed=None, target_margin=None):
+    # Se detiene antes si el intervalo de confianza ya es más estrecho que
+    # target_margin
+    _check_opponents(opponents)
+    result = EquityResult()
+    for result in iter_equity(hand, opponents, discard, iterations,
+                              chunk, workers, seed):
+        if target_margin is not None and result.margin() <= target_margin:
+            break
+    return result
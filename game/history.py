@@ -0,0 +1,381 @@
+import argparse
+import io
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from game.logic import (
+    CATEGORY_NAMES, NUM_HAND_CLASSES, best_hand, class_category,
+    class_description, hand_strength,
+)
+from net.protocol import BINARY, ProtocolError
+
+# Historial de manos: cada ronda terminada se añade a un registro binario
+# de solo escritura al final. Va por segmentos (rotan al pasar de
+# max_bytes), cada uno con dos ficheros:
+#   .log  cabecera + tramas del protocolo binario (net.protocol), una por
+#         ronda; se pueden leer en orden sin el índice
+#   .idx  cabecera + una entrada de tamaño fijo por ronda (ENTRY) con lo
+#         necesario para filtrar sin decodificar: posición de la trama,
+#         hora, mesa, ronda, fuerza ganadora y número de jugadores
+# Una ronda es un dict:
+#   t        hora (time.time())
+#   room     número de mesa; round: número de ronda en esa mesa
+#   seed     etiqueta de la secuencia de mazos de la mesa (None si no es
+#            reproducible: generador del sistema o mazos de la reserva)
+#   players  nicks repartidos, en orden de reparto
+#   dealt    las 5 cartas iniciales de cada jugador
+#   draws    cambios en el orden en que llegaron: [jugador, posiciones, cartas]
+#   timeouts jugadores que se plantaron por tiempo
+#   left     jugadores que se fueron antes del showdown
+#   winners  índices de los ganadores; strength: fuerza ganadora (1..7462)
+LOG_MAGIC = b"PKHL"
+IDX_MAGIC = b"PKHI"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sH2x")
+ENTRY = struct.Struct("<QIdIIHBB")
+MAX_BYTES = 64 * 1024 * 1024
+QUEUE_SIZE = 10000
+
+IndexEntry = namedtuple(
+    "IndexEntry",
+    "segment offset length time room round strength players winners",
+)
+
+
+def _category_bounds():
+    # las fuerzas de una misma categoría son un intervalo contiguo
+    bounds = {}
+    for strength in range(1, NUM_HAND_CLASSES + 1):
+        low, _ = bounds.get(class_category(strength), (strength, strength))
+        bounds[class_category(strength)] = (low, strength)
+    return bounds
+
+
+CATEGORY_BOUNDS = _category_bounds()
+
+
+class HandHistory:
+    # Escritor: record() solo encola (nunca bloquea la mesa ni su lock) y un
+    # hilo propio codifica, escribe y rota. Si la cola se llena, la ronda se
+    # descarta y se cuenta en `dropped`. keep > 0 borra los segmentos más
+    # antiguos de este proceso a partir de ese número.
+    def __init__(self, directory, max_bytes=MAX_BYTES, keep=0, prefix="hands"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.prefix = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.segments = []
+        self.written = 0
+        self.dropped = 0
+        self.log = self.idx = None
+        self.size = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, rnd):
+        try:
+            self.queue.put_nowait(rnd)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # espera a que se escriba lo encolado
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def _open_segment(self):
+        base = os.path.join(
+            self.directory, f"{self.prefix}-{len(self.segments):04d}"
+        )
+        self.log = open(base + ".log", "wb")
+        self.idx = open(base + ".idx", "wb")
+        self.log.write(_HEADER.pack(LOG_MAGIC, FORMAT_VERSION))
+        self.idx.write(_HEADER.pack(IDX_MAGIC, FORMAT_VERSION))
+        self.size = _HEADER.size
+        self.segments.append(base)
+        if self.keep > 0:
+            for old in self.segments[:-self.keep]:
+                for ext in (".log", ".idx"):
+                    try:
+                        os.remove(old + ext)
+                    except OSError:
+                        pass
+            del self.segments[:-self.keep]
+
+    def _close_segment(self):
+        # primero el log: una entrada del índice nunca apunta a datos que
+        # aún no están en disco
+        if self.log is not None:
+            self.log.close()
+            self.idx.close()
+            self.log = self.idx = None
+
+    def _write(self, rnd):
+        if self.log is None or self.size >= self.max_bytes:
+            self._close_segment()
+            self._open_segment()
+        frame = BINARY.encode(rnd)
+        self.log.write(frame)
+        self.idx.write(ENTRY.pack(
+            self.size, len(frame), rnd["t"], rnd["room"], rnd["round"],
+            rnd["strength"], len(rnd["players"]), len(rnd["winners"]),
+        ))
+        self.size += len(frame)
+        self.written += 1
+
+    def _run(self):
+        try:
+            while True:
+                rnd = self.queue.get()
+                # escribe de una vez lo que ya esté en cola
+                while rnd is not None:
+                    self._write(rnd)
+                    try:
+                        rnd = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if self.log is not None:
+                    self.log.flush()
+                    self.idx.flush()
+                if rnd is None:
+                    break
+        except (OSError, ValueError, TypeError) as e:
+            self.error = e
+            print("Historial de manos desactivado:", e)
+        finally:
+            self._close_segment()
+
+
+# ---------- Lectura ----------
+def _check_header(buf, magic):
+    if len(buf) < _HEADER.size:
+        raise ValueError("segmento truncado")
+    found, version = _HEADER.unpack_from(buf)
+    if found != magic or version != FORMAT_VERSION:
+        raise ValueError("no es un segmento del historial")
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def scan_log(log, start=_HEADER.size):
+    # Recorre las tramas de un .log desde `start` sin usar el índice
+    # (perdido o a medias tras una caída); devuelve (offset, longitud, ronda)
+    view = io.BytesIO(log[start:])
+    out = []
+    while True:
+        pos = view.tell()
+        try:
+            rnd = BINARY.read(view)
+        except (EOFError, ProtocolError):
+            return out
+        out.append((start + pos, view.tell() - pos, rnd))
+
+
+class Segment:
+    # Un par .log/.idx mapeados en memoria. Las entradas del índice se
+    # desempaquetan al recorrerlas; si el índice se quedó corto (caída entre
+    # las dos escrituras), las rondas que faltan se leen del log.
+    def __init__(self, base):
+        self.base = base
+        self.log = _map(base + ".log")
+        _check_header(self.log, LOG_MAGIC)
+        try:
+            self.idx = _map(base + ".idx")
+            _check_header(self.idx, IDX_MAGIC)
+            count = (len(self.idx) - _HEADER.size) // ENTRY.size
+        except (OSError, ValueError):
+            self.idx, count = None, 0
+        tail = _HEADER.size
+        while count:
+            offset, length = ENTRY.unpack_from(
+                self.idx, _HEADER.size + (count - 1) * ENTRY.size
+            )[:2]
+            if offset + length <= len(self.log):
+                tail = offset + length
+                break
+            count -= 1
+        self.count = count
+        self.extra = [
+            (offset, length, r["t"], r["room"], r["round"], r["strength"],
+             len(r["players"]), len(r["winners"]))
+            for offset, length, r in scan_log(self.log, tail)
+        ] if tail < len(self.log) else []
+
+    def __len__(self):
+        return self.count + len(self.extra)
+
+    def iter_entries(self):
+        if self.count:
+            end = _HEADER.size + self.count * ENTRY.size
+            yield from ENTRY.iter_unpack(memoryview(self.idx)[_HEADER.size:end])
+        yield from self.extra
+
+    def read(self, offset, length):
+        return BINARY.read(io.BytesIO(self.log[offset:offset + length]))
+
+    def close(self):
+        self.log.close()
+        if self.idx is not None:
+            self.idx.close()
+
+
+class HistoryReader:
+    # Lee todos los segmentos de un directorio. Los filtros de entries() y
+    # rounds() van sobre el índice; solo se decodifican las rondas que pasan.
+    def __init__(self, directory):
+        names = sorted(
+            n[:-4] for n in os.listdir(directory) if n.endswith(".log")
+        )
+        self.segments = []
+        for name in names:
+            try:
+                self.segments.append(Segment(os.path.join(directory, name)))
+            except (OSError, ValueError):
+                continue  # segmento vacío o ajeno
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def entries(self, room=None, since=None, until=None, category=None,
+                min_strength=1, max_strength=NUM_HAND_CLASSES, players=None):
+        if category is not None:
+            low, high = CATEGORY_BOUNDS[category]
+            min_strength = max(min_strength, low)
+            max_strength = min(max_strength, high)
+        for segment in self.segments:
+            for e in segment.iter_entries():
+                if room is not None and e[3] != room:
+                    continue
+                if since is not None and e[2] < since:
+                    continue
+                if until is not None and e[2] >= until:
+                    continue
+                if not min_strength <= e[5] <= max_strength:
+                    continue
+                if players is not None and e[6] != players:
+                    continue
+                yield IndexEntry(segment, *e)
+
+    def read(self, entry):
+        return entry.segment.read(entry.offset, entry.length)
+
+    def rounds(self, nick=None, **filters):
+        for entry in self.entries(**filters):
+            rnd = self.read(entry)
+            if nick is None or nick in rnd["players"]:
+                yield rnd
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+def replay(rnd):
+    # Reconstruye la ronda: devuelve (eventos, manos finales por nick)
+    players = rnd["players"]
+    hands = {p: list(c) for p, c in zip(players, rnd["dealt"])}
+    events = [("deal", p, list(c)) for p, c in hands.items()]
+    for player, indices, cards in rnd["draws"]:
+        nick = players[player]
+        for i, card in zip(indices, cards):
+            hands[nick][i] = card
+        events.append(("draw", nick, list(indices), list(cards)))
+    for player in rnd["timeouts"]:
+        events.append(("timeout", players[player]))
+    for player in rnd["left"]:
+        events.append(("leave", players[player]))
+        hands.pop(players[player], None)
+    events.append(("showdown", [players[i] for i in rnd["winners"]]))
+    return events, hands
+
+
+def check(rnd):
+    # Para auditorías: recalcula el ganador con las manos reconstruidas y
+    # devuelve las discrepancias con lo que se anunció (lista vacía si no)
+    problems = []
+    _, hands = replay(rnd)
+    cards = [c for hand in hands.values() for c in hand]
+    if len(cards) != len(set(cards)):
+        problems.append("carta repetida")
+    _, winners = best_hand(hands)
+    score = hand_strength(hands[winners[0]]) if winners else 0
+    players = rnd["players"]
+    if score != rnd["strength"]:
+        problems.append(f"fuerza {rnd['strength']}, recalculada {score}")
+    if winners != [players[i] for i in rnd["winners"]]:
+        problems.append(f"ganadores recalculados: {winners}")
+    return problems
+
+
+def describe(rnd):
+    players = rnd["players"]
+    winners = ", ".join(players[i] for i in rnd["winners"])
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(rnd["t"]))
+    return (f"{when} mesa {rnd['room']} ronda {rnd['round']}: "
+            f"{winners} ({class_description(rnd['strength'])}), "
+            f"{len(players)} jugadores")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta del historial de manos")
+    parser.add_argument("directory")
+    parser.add_argument("--room", type=int)
+    parser.add_argument("--nick")
+    parser.add_argument("--category", choices=list(CATEGORY_NAMES.values()))
+    parser.add_argument("--since", type=float, help="hora Unix")
+    parser.add_argument("--until", type=float, help="hora Unix")
+    parser.add_argument("--limit", type=int, default=20,
+                        help="rondas a mostrar (0: todas)")
+    parser.add_argument("--replay", action="store_true",
+                        help="muestra reparto y cambios de cada ronda")
+    parser.add_argument("--check", action="store_true",
+                        help="recalcula los ganadores de las rondas filtradas")
+    parser.add_argument("--count", action="store_true",
+                        help="solo cuenta las rondas (sin decodificarlas)")
+    args = parser.parse_args()
+
+    category = None
+    if args.category:
+        category = next(c for c, n in CATEGORY_NAMES.items() if n == args.category)
+    filters = {"room": args.room, "since": args.since, "until": args.until,
+               "category": category}
+    reader = HistoryReader(args.directory)
+    print(f"{len(reader)} rondas en {len(reader.segments)} segmentos")
+    if args.count and args.nick is None:
+        print(sum(1 for _ in reader.entries(**filters)))
+        return
+
+    shown = matched = bad = 0
+    for rnd in reader.rounds(nick=args.nick, **filters):
+        matched += 1
+        problems = check(rnd) if args.check else []
+        bad += bool(problems)
+        if args.count or (args.limit and shown >= args.limit and not problems):
+            continue
+        shown += 1
+        print(describe(rnd))
+        for problem in problems:
+            print("  DISCREPANCIA:", problem)
+        if args.replay:
+            for event in replay(rnd)[0]:
+                print("   ", *event)
+    print(f"{matched} rondas coinciden" + (f", {bad} con discrepancias" if args.check else ""))
+    if bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
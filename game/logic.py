@@ -1,10 +1,31 @@
+import array
+import hashlib
+import mmap
+import os
+import queue
 import random
+import struct
+import sys
+import threading
 from collections import Counter
+from itertools import combinations, combinations_with_replacement
 
 SUITS = "CDHS"
 RANKS = "23456789TJQKA"
 RANK_VALUE = {r: i for i, r in enumerate(RANKS, start=2)}
 
+CATEGORY_NAMES = {
+    8: "Escalera de color",
+    7: "Póker",
+    6: "Full",
+    5: "Color",
+    4: "Escalera",
+    3: "Trío",
+    2: "Doble par",
+    1: "Par",
+    0: "Carta alta",
+}
+
 
 def make_deck():
     return [r + s for s in SUITS for r in RANKS]
@@ -31,16 +52,15 @@ def is_flush(cards):
     return len(set(suits)) == 1
 
 
-def hand_rank(cards):
-    ranks = card_ranks(cards)
+def _classify(ranks, flush):
+    # ranks ordenados de mayor a menor; devuelve (categoría, desempates)
     counts = Counter(ranks)
     freqs = sorted(counts.values(), reverse=True)
     ordered = sorted(counts.items(), key=lambda x: (-x[1], -x[0]))
 
     is_st = is_straight(ranks)
-    is_fl = is_flush(cards)
 
-    if is_st and is_fl:
+    if is_st and flush:
         return (8, ranks)
     if freqs == [4, 1]:
         four = ordered[0][0]
@@ -50,7 +70,7 @@ def hand_rank(cards):
         three = ordered[0][0]
         pair = ordered[1][0]
         return (6, [three, pair])
-    if is_fl:
+    if flush:
         return (5, ranks)
     if is_st:
         return (4, ranks)
@@ -71,30 +91,366 @@ def hand_rank(cards):
     return (0, ranks)
 
 
+def _reference_hand_rank(cards):
+    # evaluador original sobre cartas en texto; sirve de oráculo y de
+    # línea base para los benchmarks
+    return _classify(card_ranks(cards), is_flush(cards))
+
+
+# ---------- Codificación entera de cartas ----------
+# Formato Cactus Kev (32 bits):
+#   xxxbbbbb bbbbbbbb cdhsrrrr xxpppppp
+#   b = bit del valor, cdhs = palo, r = valor (0..12), p = primo del valor
+PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+SUIT_BIT = {"C": 0x8, "D": 0x4, "H": 0x2, "S": 0x1}
+
+
+def _encode(card):
+    r = RANK_VALUE[card[0]] - 2
+    return (1 << (16 + r)) | (SUIT_BIT[card[1]] << 12) | (r << 8) | PRIMES[r]
+
+
+CARD_INT = {r + s: _encode(r + s) for s in SUITS for r in RANKS}
+INT_CARD = {v: k for k, v in CARD_INT.items()}
+
+
+def card_to_int(card):
+    return CARD_INT[card]
+
+
+def int_to_card(c):
+    return INT_CARD[c]
+
+
+def encode_hand(cards):
+    return [CARD_INT[c] for c in cards]
+
+
+def decode_hand(ints):
+    return [INT_CARD[c] for c in ints]
+
+
+# ---------- Tablas de evaluación ----------
+# Cada una de las 7462 clases de mano recibe una fuerza entera densa
+# (1 = peor, 7462 = mejor) que respeta exactamente el orden de hand_rank.
+def _build_tables():
+    classes = []  # (clave_original, tipo, índice)
+    for combo in combinations(range(13), 5):
+        ranks = [r + 2 for r in reversed(combo)]
+        bits = 0
+        for r in combo:
+            bits |= 1 << r
+        classes.append((_classify(ranks, True), "flush", bits))
+        classes.append((_classify(ranks, False), "unique", bits))
+    for combo in combinations_with_replacement(range(13), 5):
+        if len(set(combo)) == 5 or max(Counter(combo).values()) > 4:
+            continue
+        ranks = [r + 2 for r in reversed(combo)]
+        product = 1
+        for r in combo:
+            product *= PRIMES[r]
+        classes.append((_classify(ranks, False), "product", product))
+
+    classes.sort(key=lambda x: x[0])
+
+    flushes = [0] * (1 << 13)
+    unique5 = [0] * (1 << 13)
+    products = {}
+    hand_classes = [None]
+    for strength, (key, kind, idx) in enumerate(classes, start=1):
+        if kind == "flush":
+            flushes[idx] = strength
+        elif kind == "unique":
+            unique5[idx] = strength
+        else:
+            products[idx] = strength
+        hand_classes.append(key)
+    return flushes, unique5, products, hand_classes
+
+
+# ---------- Índice de clases en disco ----------
+# Las tablas se guardan en un fichero binario que se genera la primera vez
+# y después se mapea en memoria: arrancar no cuesta nada y los procesos
+# (servidor, workers de equity) comparten las mismas páginas. Enteros en
+# el orden de bytes de la máquina (anotado en la cabecera).
+# INDEX_VERSION hay que subirlo a mano al cambiar _classify,
+# _build_tables o el formato: el fichero viejo deja de valer y se
+# regenera. La huella cubre las constantes (PRIMES, RANKS) y no depende
+# del intérprete, así que varias versiones de Python comparten el fichero.
+#   cabecera  "HCLS", versión, orden de bytes, nº de clases, nº de
+#             productos, huella (8 bytes)
+#   flush     8192 x u16   fuerza por máscara de valores (todas del mismo palo)
+#   unique    8192 x u16   ídem sin color (0 = hay valores repetidos)
+#   prodkeys  P x u32      producto de primos de las manos con repetidos
+#   prodvals  P x u16      fuerza de cada producto
+#   category  (N+1) x u8   categoría por fuerza (la fuerza 0 no es una mano)
+#   kickers   (N+1) x 5 u8 desempates por fuerza, con 0 de relleno
+INDEX_VERSION = 3
+INDEX_PATH = os.environ.get("POKER_HAND_INDEX") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "hand_classes.bin"
+)
+_HEADER = struct.Struct("<4sHcxHH4x8s")
+_MAGIC = b"HCLS"
+_BYTEORDER = b"<" if sys.byteorder == "little" else b">"
+_KICKERS = 5
+
+
+def _fingerprint():
+    data = repr((INDEX_VERSION, PRIMES, RANKS, _KICKERS)).encode()
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def _build_index():
+    flushes, unique5, products, hand_classes = _build_tables()
+    keys = sorted(products)
+    out = bytearray(_HEADER.pack(
+        _MAGIC, INDEX_VERSION, _BYTEORDER, len(hand_classes) - 1, len(keys),
+        _INDEX_FINGERPRINT,
+    ))
+    out += array.array("H", flushes).tobytes()
+    out += array.array("H", unique5).tobytes()
+    out += array.array("I", keys).tobytes()
+    out += array.array("H", [products[k] for k in keys]).tobytes()
+    out += bytes([0] + [cls[0] for cls in hand_classes[1:]])
+    for cls in hand_classes:
+        kickers = cls[1] if cls else []
+        out += bytes(kickers) + bytes(_KICKERS - len(kickers))
+    return bytes(out)
+
+
+def _index_layout(buf):
+    # secciones del índice como vistas sin copia; ValueError si el
+    # fichero no es de esta versión o está truncado
+    # (todo se comprueba antes de crear vistas: así quien llama puede
+    # cerrar el mmap si falla)
+    if len(buf) < _HEADER.size:
+        raise ValueError("índice truncado")
+    magic, version, order, classes, n, fingerprint = _HEADER.unpack_from(buf)
+    if magic != _MAGIC or version != INDEX_VERSION or order != _BYTEORDER:
+        raise ValueError("índice de otra versión")
+    if fingerprint != _INDEX_FINGERPRINT:
+        raise ValueError("índice generado con otras constantes")
+    sizes = (
+        ("flush", "H", 1 << 13), ("unique", "H", 1 << 13),
+        ("prodkeys", "I", n), ("prodvals", "H", n),
+        ("category", "B", classes + 1), ("kickers", "B", (classes + 1) * _KICKERS),
+    )
+    total = _HEADER.size + sum(c * struct.calcsize(f) for _, f, c in sizes)
+    if total != len(buf):
+        raise ValueError("índice truncado")
+    view = memoryview(buf)
+    pos = _HEADER.size
+    sections = {}
+    for name, fmt, count in sizes:
+        end = pos + count * struct.calcsize(fmt)
+        sections[name] = view[pos:end].cast(fmt)
+        pos = end
+    return classes, sections
+
+
+def _map_index(path):
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return mapped, _index_layout(mapped)
+    except ValueError:
+        mapped.close()
+        raise
+
+
+def _write_index(path, data):
+    # fichero temporal + rename: otro proceso nunca ve un índice a medias
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+_INDEX_FINGERPRINT = _fingerprint()
+
+
+def load_index(path=INDEX_PATH):
+    # Devuelve (buffer, (clases, secciones)). Si el fichero falta o es de
+    # otra versión o huella se regenera; si no se puede escribir (directorio de
+    # solo lectura) las tablas se quedan en memoria de este proceso.
+    try:
+        return _map_index(path)
+    except (OSError, ValueError):
+        pass
+    data = _build_index()
+    try:
+        _write_index(path, data)
+        return _map_index(path)
+    except (OSError, ValueError):
+        return data, _index_layout(data)
+
+
+class HandClasses:
+    # Vista de solo lectura de las clases: HAND_CLASSES[fuerza] devuelve
+    # (categoría, desempates) como hand_rank; la fuerza 0 devuelve None.
+    def __init__(self, category, kickers):
+        self.category = category
+        self.kickers = kickers
+
+    def __len__(self):
+        return len(self.category)
+
+    def __getitem__(self, strength):
+        if not strength:
+            return None
+        pos = strength * _KICKERS
+        kickers = [r for r in self.kickers[pos:pos + _KICKERS] if r]
+        return self.category[strength], kickers
+
+
+_INDEX_BUFFER, (NUM_HAND_CLASSES, _INDEX) = load_index()
+_FLUSHES = _INDEX["flush"]
+_UNIQUE5 = _INDEX["unique"]
+_PRODUCTS = dict(zip(_INDEX["prodkeys"], _INDEX["prodvals"]))
+_CATEGORY = _INDEX["category"]
+_KICKER_BYTES = _INDEX["kickers"]
+HAND_CLASSES = HandClasses(_CATEGORY, _KICKER_BYTES)
+
+
+def class_category(strength):
+    return _CATEGORY[strength]
+
+
+def class_kickers(strength):
+    pos = strength * _KICKERS
+    return [r for r in _KICKER_BYTES[pos:pos + _KICKERS] if r]
+
+
+def class_description(strength):
+    return CATEGORY_NAMES.get(_CATEGORY[strength], "Desconocida")
+
+
+def evaluate5(c1, c2, c3, c4, c5):
+    q = (c1 | c2 | c3 | c4 | c5) >> 16
+    if c1 & c2 & c3 & c4 & c5 & 0xF000:
+        return _FLUSHES[q]
+    s = _UNIQUE5[q]
+    if s:
+        return s
+    return _PRODUCTS[
+        (c1 & 0xFF) * (c2 & 0xFF) * (c3 & 0xFF) * (c4 & 0xFF) * (c5 & 0xFF)
+    ]
+
+
+def hand_strength(cards):
+    c = CARD_INT
+    return evaluate5(c[cards[0]], c[cards[1]], c[cards[2]], c[cards[3]], c[cards[4]])
+
+
+def hand_rank(cards):
+    return HAND_CLASSES[hand_strength(cards)]
+
+
 def hand_description(cards):
-    category, _ = hand_rank(cards)
-    names = {
-        8: "Escalera de color",
-        7: "Póker",
-        6: "Full",
-        5: "Color",
-        4: "Escalera",
-        3: "Trío",
-        2: "Doble par",
-        1: "Par",
-        0: "Carta alta",
-    }
-    return names.get(category, "Desconocida")
+    return class_description(hand_strength(cards))
 
 
 def best_hand(hands_by_player):
-    best_score = None
+    best = 0
     winners = []
     for nick, cards in hands_by_player.items():
-        score = hand_rank(cards)
-        if best_score is None or score > best_score:
-            best_score = score
+        score = hand_strength(cards)
+        if score > best:
+            best = score
             winners = [nick]
-        elif score == best_score:
+        elif score == best:
             winners.append(nick)
-    return best_score, winners
\ No newline at end of file
+    return (HAND_CLASSES[best] if winners else None), winners
+
+
+# ---------- Mazo ----------
+DECK_CARDS = tuple(make_deck())
+DECK_INTS = tuple(CARD_INT[c] for c in DECK_CARDS)
+
+
+def make_rng(seed=None, secure=False):
+    # secure=True: generador del sistema operativo (no reproducible, para
+    # mesas donde importa la imparcialidad). Con seed, reproducible.
+    if secure:
+        return random.SystemRandom()
+    return random.Random(seed)
+
+
+class Deck:
+    # Mazo reutilizable: un array de índices (0..51, ver DECK_CARDS) que se
+    # baraja solo a medida que se reparte (Fisher-Yates parcial desde el
+    # final). reset() lo deja listo para otra ronda sin crear listas; como
+    # el barajado parte de cualquier permutación, el resultado sigue siendo
+    # uniforme. `exclude` quita cartas ya conocidas (simulaciones).
+    def __init__(self, rng=None, exclude=()):
+        self.rng = rng if rng is not None else random.Random()
+        skip = {DECK_CARDS.index(c) for c in exclude}
+        self.cards = [i for i in range(52) if i not in skip]
+        self.left = len(self.cards)
+        self.shuffled = False  # ya barajado entero (DeckPool)
+
+    def reset(self):
+        self.left = len(self.cards)
+        self.shuffled = False
+
+    def shuffle(self):
+        # baraja todo lo que queda; después deal() solo toma del final
+        cards = self.cards
+        rand = self.rng.random
+        for i in range(self.left - 1, 0, -1):
+            j = int(rand() * (i + 1))
+            cards[i], cards[j] = cards[j], cards[i]
+        self.shuffled = True
+
+    def deal_indices(self, n):
+        top = self.left
+        if n > top:
+            raise ValueError("no quedan cartas suficientes en el mazo")
+        cards = self.cards
+        if self.shuffled:
+            out = cards[top - n:top]
+            out.reverse()
+        else:
+            # int(random() * k) tiene un sesgo < 2**-47 para k <= 52
+            rand = self.rng.random
+            out = []
+            for i in range(top - 1, top - 1 - n, -1):
+                j = int(rand() * (i + 1))
+                cards[i], cards[j] = cards[j], cards[i]
+                out.append(cards[i])
+        self.left = top - n
+        return out
+
+    def deal(self, n):
+        return [DECK_CARDS[i] for i in self.deal_indices(n)]
+
+    def deal_ints(self, n):
+        return [DECK_INTS[i] for i in self.deal_indices(n)]
+
+    def __len__(self):
+        return self.left
+
+
+class DeckPool:
+    # Mazos completos barajados por adelantado en un hilo, para que la mesa
+    # no baraje al empezar la ronda. Un solo productor con un solo rng: con
+    # semilla, la secuencia de mazos es reproducible.
+    def __init__(self, rng=None, size=64):
+        self.rng = rng if rng is not None else random.Random()
+        self.ready = queue.Queue(maxsize=size)
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def _fill(self):
+        while True:
+            deck = Deck(self.rng)
+            deck.shuffle()
+            self.ready.put(deck)
+
+    def get(self):
+        # si la reserva está vacía espera al productor (microsegundos)
+        return self.ready.get()
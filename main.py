@@ -1,17 +1,93 @@
-import pygame, sys
-from collections import deque
-import numpy as np
-from moviepy import VideoFileClip
+import time
+
+STARTED = time.perf_counter()
+
+import pygame, sys, threading
+from collections import deque, OrderedDict
+from functools import lru_cache
 from net.client import NetClient
-import webbrowser
+
+# moviepy (imageio, ffmpeg), el motor de equity/descartes (construye tablas
+# al importarse) y webbrowser no hacen falta para el primer frame: se
+# importan donde se usan y warm_up() los precarga en segundo plano.
 
 pygame.init()
 WIDTH, HEIGHT = 960, 540
 SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Póker Simplificado")
 CLOCK = pygame.time.Clock()
-FONT = pygame.font.SysFont("arial", 24)
-SMALL = pygame.font.SysFont("arial", 18)
+SCREEN_RECT = pygame.Rect(0, 0, WIDTH, HEIGHT)
+ACTIVE_FPS = 60
+IDLE_FPS = 10
+IDLE_AFTER = 1.0  # segundos sin cambios antes de bajar a IDLE_FPS
+
+
+# ---------- Caché de render ----------
+_FONTS = {}
+
+
+def get_font(name, size, bold=False):
+    # SysFont busca la fuente en el sistema: se hace una sola vez por tamaño
+    key = (name, size, bold)
+    font = _FONTS.get(key)
+    if font is None:
+        font = _FONTS[key] = pygame.font.SysFont(name, size, bold=bold)
+    return font
+
+
+class TextCache:
+    # Superficies de texto ya renderizadas, por (fuente, texto, color), con
+    # expulsión LRU
+    def __init__(self, max_items=512):
+        self.items = OrderedDict()
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.items.get(key)
+        if surf is not None:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self.items[key] = font.render(text, True, color)
+        if len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+        return surf
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(font, text, color):
+    return TEXT_CACHE.render(font, text, color)
+
+
+class StaticLayer:
+    # Capa pre-renderizada del tamaño de la ventana: `paint` solo se vuelve
+    # a llamar cuando cambia la clave que se pasa a get()
+    def __init__(self, paint):
+        self.paint = paint
+        self.surf = None
+        self.key = None
+
+    def get(self, key=None):
+        if self.surf is None or key != self.key:
+            if self.surf is None:
+                self.surf = pygame.Surface((WIDTH, HEIGHT)).convert()
+            self.paint(self.surf)
+            self.key = key
+        return self.surf
+
+
+FONT = get_font("arial", 24)
+SMALL = get_font("arial", 18)
 
 
 # ---------- Widgets ----------
@@ -21,10 +97,13 @@ class Button:
         self.text = text
         self.on_click = on_click
         self.hover = False
+        self.changed = True
 
     def handle_event(self, e):
         if e.type == pygame.MOUSEMOTION:
-            self.hover = self.rect.collidepoint(e.pos)
+            hover = self.rect.collidepoint(e.pos)
+            self.changed |= hover != self.hover
+            self.hover = hover
         elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
             if self.rect.collidepoint(e.pos):
                 self.on_click()
@@ -33,7 +112,7 @@ class Button:
         color = (60, 120, 200) if self.hover else (40, 90, 160)
         pygame.draw.rect(surf, color, self.rect, border_radius=10)
         pygame.draw.rect(surf, (20, 40, 80), self.rect, 2, border_radius=10)
-        txt = FONT.render(self.text, True, (255, 255, 255))
+        txt = render_text(FONT, self.text, (255, 255, 255))
         surf.blit(txt, txt.get_rect(center=self.rect.center))
 
 
@@ -45,13 +124,17 @@ class TextInput:
         self.active = False
         self.cursor_time = 0
         self.show_cursor = True
+        self.changed = True
 
     def handle_event(self, e):
         if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-            self.active = self.rect.collidepoint(e.pos)
+            active = self.rect.collidepoint(e.pos)
+            self.changed |= active != self.active
+            self.active = active
         if not self.active:
             return None
         if e.type == pygame.KEYDOWN:
+            self.changed = True
             if e.key == pygame.K_RETURN:
                 val = self.text
                 self.text = ""
@@ -67,13 +150,14 @@ class TextInput:
         if self.cursor_time >= 0.5:
             self.cursor_time = 0
             self.show_cursor = not self.show_cursor
+            self.changed |= self.active
 
     def draw(self, surf):
         pygame.draw.rect(surf, (250, 250, 250), self.rect, border_radius=8)
         pygame.draw.rect(surf, (180, 180, 180), self.rect, 2, border_radius=8)
         txt_show = self.text if (self.text or self.active) else self.placeholder
         color = (0, 0, 0) if (self.text or self.active) else (120, 120, 120)
-        txt = SMALL.render(txt_show, True, color)
+        txt = render_text(SMALL, txt_show, color)
         surf.blit(txt, (self.rect.x + 10, self.rect.y + 10))
         if self.active and self.show_cursor:
             cx = self.rect.x + 10 + txt.get_width() + 2
@@ -84,6 +168,7 @@ class TextInput:
 
 
 # ---------- Función de ayuda para envolver texto ----------
+@lru_cache(maxsize=1024)
 def wrap_text(text, font, max_width):
     words = text.split(" ")
     lines = []
@@ -99,13 +184,27 @@ def wrap_text(text, font, max_width):
             current = w
     if current:
         lines.append(current)
-    return lines
+    return tuple(lines)
 
 
 # ---------- Base de pantallas ----------
 class ScreenBase:
+    # Cada pantalla acumula las regiones que cambiaron desde el último
+    # frame; el bucle principal solo redibuja y envía esas regiones.
     def __init__(self, manager):
         self.mgr = manager
+        self.dirty = [SCREEN_RECT.copy()]
+
+    def invalidate(self, rect=None):
+        self.dirty.append(pygame.Rect(rect) if rect else SCREEN_RECT.copy())
+
+    def collect_dirty(self):
+        for w in list(vars(self).values()):
+            if isinstance(w, (Button, TextInput)) and w.changed:
+                w.changed = False
+                self.dirty.append(w.rect.inflate(4, 4))
+        rects, self.dirty = self.dirty, []
+        return rects
 
     def handle_event(self, e):
         pass
@@ -157,8 +256,11 @@ class WelcomeScreen(ScreenBase):
             "Acerca de",
             self.open_about,
         )
+        self.background = StaticLayer(self.paint_background)
 
     def open_about(self):
+        import webbrowser
+
         webbrowser.open("http://127.0.0.1:8000")
 
     def handle_event(self, e):
@@ -169,22 +271,15 @@ class WelcomeScreen(ScreenBase):
         self.btn_game.handle_event(e)
         self.btn_about.handle_event(e)
 
-    def draw(self, surf):
+    def paint_background(self, surf):
         surf.fill((15, 60, 25))
-        title_font = pygame.font.SysFont("arial", 48, bold=True)
+        title_font = get_font("arial", 48, bold=True)
         title = title_font.render("Póker Simplificado", True, (255, 255, 255))
         surf.blit(title, title.get_rect(center=(WIDTH // 2, 130)))
 
         subtitle = FONT.render("Bienvenido", True, (230, 230, 230))
         surf.blit(subtitle, subtitle.get_rect(center=(WIDTH // 2, 180)))
 
-        self.btn_instructions.draw(surf)
-        self.btn_video.draw(surf)
-        self.btn_settings.draw(surf)
-        self.btn_chat.draw(surf)
-        self.btn_game.draw(surf)
-        self.btn_about.draw(surf)
-
         tip = SMALL.render(
             "Haz clic en los botones para navegar. ESC vuelve atrás.",
             True,
@@ -192,6 +287,16 @@ class WelcomeScreen(ScreenBase):
         )
         surf.blit(tip, tip.get_rect(midbottom=(WIDTH // 2, HEIGHT - 10)))
 
+    def draw(self, surf):
+        surf.blit(self.background.get(), (0, 0))
+
+        self.btn_instructions.draw(surf)
+        self.btn_video.draw(surf)
+        self.btn_settings.draw(surf)
+        self.btn_chat.draw(surf)
+        self.btn_game.draw(surf)
+        self.btn_about.draw(surf)
+
 
 # ---------- Instrucciones ----------
 class InstructionsScreen(ScreenBase):
@@ -209,13 +314,21 @@ class InstructionsScreen(ScreenBase):
         "El chat interno permite comunicarse con los demás jugadores.",
     ]
 
+    def __init__(self, mgr):
+        super().__init__(mgr)
+        # pantalla totalmente estática: se pinta una vez
+        self.background = StaticLayer(self.paint_background)
+
     def handle_event(self, e):
         if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
             self.mgr.goto("welcome")
 
     def draw(self, surf):
+        surf.blit(self.background.get(), (0, 0))
+
+    def paint_background(self, surf):
         surf.fill((25, 25, 35))
-        t = pygame.font.SysFont("arial", 40, bold=True).render(
+        t = get_font("arial", 40, bold=True).render(
             "Instrucciones", True, (255, 255, 255)
         )
         surf.blit(t, (40, 40))
@@ -232,12 +345,147 @@ class InstructionsScreen(ScreenBase):
 
 
 # ---------- Video ----------
+class VideoDecoder:
+    # Decodifica el video en un hilo propio y deja en un búfer circular
+    # acotado los frames ya convertidos al tamaño final, con su marca de
+    # tiempo (pts). El hilo de la interfaz solo elige cuál mostrar.
+    #
+    # Con zero_copy=True los frames se escriben en un conjunto fijo de
+    # superficies reservadas al arrancar (capacity + 1: la que se está
+    # mostrando no se reutiliza hasta que llega la siguiente), así que no
+    # se crea ninguna Surface por frame.
+    def __init__(self, path, size, capacity=24, zero_copy=True):
+        self.path = path
+        self.size = size
+        self.capacity = capacity
+        self.zero_copy = zero_copy
+        self.frames = deque()
+        self.free = deque()
+        self.shown = None
+        self.allocated = 0  # superficies creadas, para los benchmarks
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.duration = 0.0
+        self.error = None
+        self.dropped = 0
+
+    def start(self):
+        if self.zero_copy:
+            self.free.extend(
+                pygame.Surface(self.size) for _ in range(self.capacity + 1)
+            )
+            self.allocated += self.capacity + 1
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.frames.clear()
+            self.free.clear()
+            self.shown = None
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        try:
+            from moviepy import VideoFileClip
+
+            # ffmpeg escala al decodificar: el frame ya sale a self.size
+            clip = VideoFileClip(self.path, target_resolution=self.size)
+        except Exception as e:
+            self.error = e
+            return
+        try:
+            self.duration = float(clip.duration or 0.0)
+            fps = float(clip.fps or 30.0)
+            count = max(1, int(self.duration * fps))
+            loop = 0
+            while self.running:
+                for i in range(count):
+                    pts = i / fps
+                    frame = clip.get_frame(pts)
+                    with self.cond:
+                        while self.running and self._full():
+                            self.cond.wait()
+                        if not self.running:
+                            return
+                        slot = self.free.popleft() if self.zero_copy else None
+                    # la ranura es solo de este hilo hasta que entra en frames
+                    surf = self._to_surface(frame, slot)
+                    with self.cond:
+                        if not self.running:
+                            return
+                        self.frames.append((loop, pts, surf))
+                loop += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                if getattr(clip, "reader", None) is not None:
+                    clip.reader.close()
+                clip.close()
+            except:
+                pass
+
+    def _full(self):
+        if self.zero_copy:
+            return not self.free
+        return len(self.frames) >= self.capacity
+
+    def _release(self, surf):
+        if self.zero_copy and surf is not None:
+            self.free.append(surf)
+
+    def _to_surface(self, frame, slot=None):
+        view = frame.swapaxes(0, 1)  # vista (ancho, alto, 3), sin copia
+        if slot is not None and view.shape[:2] == self.size:
+            pygame.surfarray.blit_array(slot, view)
+            return slot
+        surf = pygame.surfarray.make_surface(view)
+        self.allocated += 1
+        if slot is not None:
+            return pygame.transform.smoothscale(surf, self.size, slot)
+        if surf.get_size() != self.size:
+            surf = pygame.transform.smoothscale(surf, self.size)
+            self.allocated += 1
+        return surf
+
+    def frame_at(self, loop, t):
+        # Último frame con pts <= t de la vuelta `loop`; los anteriores que
+        # ya llegan tarde se descartan sin mostrarse. None si no hay nuevo.
+        chosen = None
+        with self.cond:
+            while self.frames:
+                f_loop, pts, surf = self.frames[0]
+                if f_loop > loop or (f_loop == loop and pts > t):
+                    break
+                self.frames.popleft()
+                if chosen is not None:
+                    self.dropped += 1
+                    self._release(chosen)
+                chosen = surf
+                if f_loop < loop:
+                    self._release(chosen)
+                    chosen = None
+            if chosen is not None:
+                self._release(self.shown)
+                self.shown = chosen
+            self.cond.notify_all()
+        return chosen
+
+
 class VideoScreen(ScreenBase):
     def __init__(self, mgr):
         super().__init__(mgr)
-        self.clip = None
+        self.video_path = "assets/video/promo.mp4"
+        self.decoder = None
         self.playing = False
         self.play_time = 0.0
+        self.loop = 0
         self.frame_surf = None
         self.target_size = (640, 360)
         self.btn_play = Button(
@@ -245,6 +493,7 @@ class VideoScreen(ScreenBase):
             "Reproducir / Pausa",
             self.toggle,
         )
+        self.background = StaticLayer(self.paint_background)
 
         self.audio_path = "assets/video/promo.mp3"
         self.audio_loaded = False
@@ -263,10 +512,12 @@ class VideoScreen(ScreenBase):
                 print("Mixer no disponible:", e)
 
     def load_clip(self):
-        if self.clip is not None:
+        if self.decoder is not None:
             return
-        self.clip = VideoFileClip("assets/video/promo.mp4")
+        self.decoder = VideoDecoder(self.video_path, self.target_size)
+        self.decoder.start()
         self.play_time = 0.0
+        self.loop = 0
 
         try:
             if pygame.mixer.get_init():
@@ -279,7 +530,7 @@ class VideoScreen(ScreenBase):
             self.audio_loaded = False
 
     def toggle(self):
-        if self.clip is None:
+        if self.decoder is None:
             try:
                 self.load_clip()
             except Exception as e:
@@ -310,8 +561,25 @@ class VideoScreen(ScreenBase):
             self.mgr.goto("welcome")
         self.btn_play.handle_event(e)
 
+    def clock(self, dt):
+        # Con audio, el reloj maestro es la posición de la música; sin él,
+        # el tiempo acumulado del bucle.
+        if self.audio_loaded and self.audio_started and not self.audio_paused:
+            pos = pygame.mixer.music.get_pos()
+            if pos >= 0:
+                return pos / 1000.0
+        return self.play_time + dt
+
     def update(self, dt):
-        if not self.playing or self.clip is None:
+        if not self.playing or self.decoder is None:
+            return
+
+        if self.decoder.error is not None:
+            print("Error obteniendo frame:", self.decoder.error)
+            self.playing = False
+            if self.audio_loaded:
+                pygame.mixer.music.pause()
+                self.audio_paused = True
             return
 
         if self.preroll_left > 0:
@@ -319,68 +587,57 @@ class VideoScreen(ScreenBase):
             if self.preroll_left > 0:
                 return
 
-        self.play_time += dt
-        dur = float(self.clip.duration or 0.0)
+        self.play_time = self.clock(dt)
+        dur = self.decoder.duration
 
         if dur > 0 and self.play_time >= dur:
             self.play_time = 0.0
+            self.loop += 1
             if self.audio_loaded:
                 pygame.mixer.music.stop()
                 pygame.mixer.music.play()
                 self.audio_started = True
                 self.audio_paused = False
 
-        try:
-            frame = self.clip.get_frame(self.play_time)
-        except Exception as e:
-            print("Error obteniendo frame:", e)
-            self.playing = False
-            if self.audio_loaded:
-                pygame.mixer.music.pause()
-                self.audio_paused = True
-            return
+        surf = self.decoder.frame_at(self.loop, self.play_time)
+        if surf is not None:
+            self.frame_surf = surf
+            self.invalidate(self.frame_rect())
 
-        frame_whc = np.swapaxes(frame, 0, 1)
-        surf = pygame.surfarray.make_surface(frame_whc)
-        self.frame_surf = pygame.transform.smoothscale(
-            surf, self.target_size
-        )
+    def frame_rect(self):
+        rect = pygame.Rect((0, 0), self.target_size)
+        rect.center = (WIDTH // 2, HEIGHT // 2 - 20)
+        return rect
 
-    def draw(self, surf):
+    def paint_background(self, surf):
         surf.fill((10, 10, 10))
-        title = pygame.font.SysFont("arial", 36, bold=True).render(
+        title = get_font("arial", 36, bold=True).render(
             "Video promocional", True, (255, 255, 255)
         )
         surf.blit(title, (40, 30))
-        if self.frame_surf:
-            surf.blit(
-                self.frame_surf,
-                self.frame_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 20)),
-            )
-        self.btn_play.draw(surf)
         hint = SMALL.render("ESC: Volver", True, (200, 200, 200))
         surf.blit(hint, (40, HEIGHT - 40))
 
+    def draw(self, surf):
+        surf.blit(self.background.get(), (0, 0))
+        if self.frame_surf:
+            surf.blit(self.frame_surf, self.frame_rect())
+        self.btn_play.draw(surf)
+
     def cleanup(self):
         try:
             if self.audio_loaded and pygame.mixer.get_init():
                 pygame.mixer.music.stop()
         except:
             pass
-        if self.clip is not None:
-            try:
-                if hasattr(self.clip, "reader") and self.clip.reader is not None:
-                    try:
-                        self.clip.reader.close()
-                    except:
-                        pass
-                self.clip.close()
-            except:
-                pass
-        self.clip = None
+        if self.decoder is not None:
+            self.decoder.stop()
+        self.decoder = None
         self.playing = False
         self.play_time = 0.0
+        self.loop = 0
         self.frame_surf = None
+        self.invalidate(self.frame_rect())
         self.preroll_left = 0.0
         self.audio_started = False
         self.audio_paused = False
@@ -404,6 +661,7 @@ class SettingsScreen(ScreenBase):
             self.save,
         )
         self.message = ""
+        self.background = StaticLayer(self.paint_background)
 
     def save(self):
         self.mgr.config["nick"] = self.name_input.text or "Anon"
@@ -411,6 +669,7 @@ class SettingsScreen(ScreenBase):
             self.server_input.text or "127.0.0.1:5000"
         )
         self.message = "Configuración guardada."
+        self.invalidate()
 
     def handle_event(self, e):
         self.name_input.handle_event(e)
@@ -423,19 +682,22 @@ class SettingsScreen(ScreenBase):
         self.name_input.update(dt)
         self.server_input.update(dt)
 
-    def draw(self, surf):
+    def paint_background(self, surf):
         surf.fill((35, 30, 30))
-        t = pygame.font.SysFont("arial", 40, bold=True).render(
+        t = get_font("arial", 40, bold=True).render(
             "Configuración", True, (255, 255, 255)
         )
         surf.blit(t, (40, 40))
+        hint = SMALL.render("ESC: Volver", True, (200, 200, 200))
+        surf.blit(hint, (40, HEIGHT - 40))
+
+    def draw(self, surf):
+        surf.blit(self.background.get(), (0, 0))
         self.name_input.draw(surf)
         self.server_input.draw(surf)
         self.save_btn.draw(surf)
-        msg = SMALL.render(self.message, True, (210, 210, 210))
+        msg = render_text(SMALL, self.message, (210, 210, 210))
         surf.blit(msg, (WIDTH // 2 - msg.get_width() // 2, 380))
-        hint = SMALL.render("ESC: Volver", True, (200, 200, 200))
-        surf.blit(hint, (40, HEIGHT - 40))
 
 
 # ---------- Chat multijugador ----------
@@ -447,16 +709,25 @@ class ChatScreen(ScreenBase):
             "Escribe mensaje... (Enter para enviar)",
         )
         self.messages = deque(maxlen=200)
+        self.messages_serial = 0
+        self.inbox = mgr.inboxes["chat"]
+        # fondo + historial: solo se repinta cuando llega un mensaje
+        self.background = StaticLayer(self.paint_background)
         self.btn_connect = Button(
             (20, 20, 140, 40),
             "Conectar",
             self.connect,
         )
 
+    def add_message(self, entry):
+        self.messages.append(entry)
+        self.messages_serial += 1
+        self.invalidate()
+
     def connect(self):
         net = self.mgr.net_client
         if net.sock:
-            self.messages.append(("sistema", "Ya estás conectado."))
+            self.add_message(("sistema", "Ya estás conectado."))
             return
         hostport = (
             self.mgr.config.get("server") or "127.0.0.1:5000"
@@ -465,11 +736,11 @@ class ChatScreen(ScreenBase):
         nick = self.mgr.config.get("nick") or "Anon"
         try:
             net.connect(host, port, nick)
-            self.messages.append(
+            self.add_message(
                 ("sistema", f"Conectado a {host}:{port} como {nick}")
             )
         except Exception as e:
-            self.messages.append(("sistema", f"Error de conexión: {e}"))
+            self.add_message(("sistema", f"Error de conexión: {e}"))
 
     def handle_event(self, e):
         if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
@@ -487,28 +758,23 @@ class ChatScreen(ScreenBase):
         if net.sock:
             net.send({"type": "chat", "msg": text})
         else:
-            self.messages.append(
+            self.add_message(
                 ("sistema", "No conectado. Usa 'Conectar'.")
             )
 
     def update(self, dt):
         self.input.update(dt)
-        net = self.mgr.net_client
-        while True:
-            msg = net.get_nowait()
-            if msg is None:
-                break
+        for msg in self.inbox.drain():
             mtype = msg.get("type")
             if mtype == "chat":
                 sender = msg.get("from", "?")
                 text = msg.get("msg", "")
-                self.messages.append(("chat", f"{sender}: {text}"))
+                self.add_message(("chat", f"{sender}: {text}"))
             elif mtype == "info":
-                self.messages.append(("sistema", msg.get("text", "")))
+                self.add_message(("sistema", msg.get("text", "")))
 
-    def draw(self, surf):
+    def paint_background(self, surf):
         surf.fill((20, 20, 28))
-        self.btn_connect.draw(surf)
 
         area = pygame.Rect(20, 80, WIDTH - 40, HEIGHT - 180)
         pygame.draw.rect(surf, (35, 35, 45), area, border_radius=8)
@@ -527,10 +793,14 @@ class ChatScreen(ScreenBase):
             if y < area.top + 8:
                 break
 
-        self.input.draw(surf)
         hint = SMALL.render("ESC: Volver", True, (200, 200, 200))
         surf.blit(hint, (20, HEIGHT - 80))
 
+    def draw(self, surf):
+        surf.blit(self.background.get(self.messages_serial), (0, 0))
+        self.btn_connect.draw(surf)
+        self.input.draw(surf)
+
 
 # ---------- Pantalla de Juego ----------
 class GameScreen(ScreenBase):
@@ -543,6 +813,9 @@ class GameScreen(ScreenBase):
             (20, 120, 200, 40), "Cambiar cartas", self.send_draw
         )
         self.status_lines = deque(maxlen=8)
+        self.status_serial = 0
+        # fondo + registro de estado: solo se repinta con cada self.log()
+        self.background = StaticLayer(self.paint_background)
         self.cards = []
         self.card_rects = []
         self.card_selected = set()
@@ -550,10 +823,73 @@ class GameScreen(ScreenBase):
         self.phase = "waiting"
         self.players = []
         self.round_number = 0
+        self.room = None
+        self.state_version = 0
         self.showdown_info = None  # dict con winners, description, hands
+        self.odds_text = ""
+        self.odds_job = 0
+        # (trabajo, texto) que deja el hilo de la estimación; update() lo
+        # aplica en el hilo principal, el único que toca self.dirty
+        self.odds_results = deque()
+        # mano y estado: último valor (serial, mensaje); el resto, en orden
+        self.hand_serial = 0
+        self.state_serial = 0
+        self.inbox = mgr.inboxes["game"]
 
     def log(self, text):
         self.status_lines.append(text)
+        self.status_serial += 1
+        self.invalidate()
+
+    def apply_delta(self, msg):
+        # Los cambios llegan numerados; si falta alguno se pide la
+        # instantánea completa en lugar de aplicar un estado incoherente.
+        version = msg.get("version", 0)
+        if msg.get("room") == self.room and version <= self.state_version:
+            return  # ya incluido en la instantánea
+        if (
+            msg.get("room") != self.room
+            or msg.get("version") != self.state_version + 1
+        ):
+            self.mgr.net_client.send({"type": "resync"})
+            return
+        for op in msg.get("ops", []):
+            kind = op.get("op")
+            if kind == "join":
+                if op.get("player") not in self.players:
+                    self.players.append(op.get("player"))
+            elif kind == "leave":
+                if op.get("player") in self.players:
+                    self.players.remove(op.get("player"))
+            elif kind == "phase":
+                self.phase = op.get("phase", self.phase)
+                self.round_number = op.get("round", self.round_number)
+        self.state_version = msg["version"]
+
+    def start_odds(self):
+        # estimación en segundo plano; un trabajo nuevo invalida al anterior
+        self.odds_job += 1
+        job = self.odds_job
+        cards = list(self.cards)
+        if len(cards) != 5:
+            self.odds_text = ""
+            return
+        opponents = max(1, len(self.players) - 1)
+        discard = sorted(self.card_selected) if self.can_draw else []
+
+        def run():
+            from game.equity import iter_equity
+
+            for res in iter_equity(
+                cards, opponents, discard, iterations=6000, chunk=500, workers=0
+            ):
+                if job != self.odds_job:
+                    return
+                self.odds_results.append(
+                    (job, f"Prob. de ganar: {res.win:.0%} (empate {res.tie:.0%})")
+                )
+
+        threading.Thread(target=run, daemon=True).start()
 
     def join_game(self):
         net = self.mgr.net_client
@@ -570,10 +906,28 @@ class GameScreen(ScreenBase):
         net = self.mgr.net_client
         net.send({"type": "draw", "cards": indices})
         self.card_selected.clear()
+        self.invalidate()
+
+    def show_hint(self):
+        if not self.can_draw or len(self.cards) != 5:
+            self.log("No hay sugerencia disponible ahora.")
+            return
+        from game.discard import best_discard
+
+        discard, _, _ = best_discard(self.cards)
+        self.card_selected = set(discard)
+        if discard:
+            names = ", ".join(self.cards[i] for i in discard)
+            self.log(f"Sugerencia: cambiar {names}.")
+        else:
+            self.log("Sugerencia: quedarse con la mano.")
+        self.start_odds()
 
     def handle_event(self, e):
         if e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
             self.mgr.goto("welcome")
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_h:
+            self.show_hint()
         self.btn_join.handle_event(e)
         self.btn_draw.handle_event(e)
 
@@ -586,48 +940,105 @@ class GameScreen(ScreenBase):
                         else:
                             if len(self.card_selected) < 3:
                                 self.card_selected.add(i)
+                        self.start_odds()
+                        self.invalidate()
                         break
 
     def update(self, dt):
         net = self.mgr.net_client
-        while True:
-            msg = net.get_nowait()
-            if msg is None:
-                break
-            mtype = msg.get("type")
-            if mtype == "info":
-                self.log(msg.get("text", ""))
-            elif mtype == "hand":
+        serial, msg = net.latest("game_state")
+        if serial != self.state_serial:
+            self.state_serial = serial
+            if msg is not None:
+                self.invalidate()
+                self.phase = msg.get("phase", "waiting")
+                self.players = list(msg.get("players", []))
+                self.round_number = msg.get("round", 0)
+                self.room = msg.get("room")
+                self.state_version = msg.get("version", 0)
+
+        serial, msg = net.latest("hand")
+        if serial != self.hand_serial:
+            self.hand_serial = serial
+            if msg is not None:
+                self.invalidate()
                 self.cards = msg.get("cards", [])
                 self.can_draw = bool(msg.get("can_draw", False))
                 self.card_selected.clear()
-            elif mtype == "game_state":
-                self.phase = msg.get("phase", "waiting")
-                self.players = msg.get("players", [])
-                self.round_number = msg.get("round", 0)
+                self.start_odds()
+                if self.can_draw and len(self.cards) == 5:
+                    # resuelve el descarte exacto en segundo plano para que
+                    # la sugerencia (tecla H) salga de la caché
+                    threading.Thread(
+                        target=solve_hand, args=(list(self.cards),), daemon=True
+                    ).start()
+
+        while self.odds_results:
+            job, text = self.odds_results.popleft()
+            if job == self.odds_job:
+                self.odds_text = text
+                self.invalidate()
+
+        for msg in self.inbox.drain():
+            self.invalidate()
+            mtype = msg.get("type")
+            if mtype == "info":
+                self.log(msg.get("text", ""))
+            elif mtype == "state_delta":
+                self.apply_delta(msg)
             elif mtype == "showdown":
                 self.showdown_info = msg
                 winners = msg.get("winners", [])
                 desc = msg.get("description", "")
                 self.log(f"Ganador(es): {', '.join(winners)} ({desc})")
 
-    def draw(self, surf):
+    def paint_background(self, surf):
         surf.fill((0, 80, 0))
-        title = pygame.font.SysFont("arial", 36, bold=True).render(
+        title = get_font("arial", 36, bold=True).render(
             "Mesa de juego", True, (255, 255, 255)
         )
         surf.blit(title, (40, 20))
 
+        area = pygame.Rect(40, HEIGHT - 150, WIDTH - 80, 110)
+        pygame.draw.rect(surf, (0, 60, 0), area, border_radius=8)
+        pygame.draw.rect(surf, (0, 100, 0), area, 2, border_radius=8)
+
+        max_width = area.width - 20
+        wrapped_lines = []
+        for line in self.status_lines:
+            wrapped_lines.extend(wrap_text(line, SMALL, max_width))
+
+        y = area.y + 10
+        for line in wrapped_lines[-20:]:
+            txt = SMALL.render(line, True, (230, 230, 230))
+            if y + txt.get_height() > area.bottom - 10:
+                break
+            surf.blit(txt, (area.x + 10, y))
+            y += txt.get_height() + 4
+
+        hint = SMALL.render(
+            "ESC: Volver | H: Sugerir descarte", True, (230, 230, 230)
+        )
+        surf.blit(hint, (40, HEIGHT - 30))
+
+    def draw(self, surf):
+        surf.blit(self.background.get(self.status_serial), (0, 0))
+
         self.btn_join.draw(surf)
         self.btn_draw.draw(surf)
 
         info_text = (
+            f"Mesa: {self.room or '-'} | "
             f"Fase: {self.phase} | Ronda: {self.round_number} | "
             f"Jugadores: {', '.join(self.players) or 'Ninguno'}"
         )
-        tinfo = SMALL.render(info_text, True, (255, 255, 255))
+        tinfo = render_text(SMALL, info_text, (255, 255, 255))
         surf.blit(tinfo, (40, 180))
 
+        if self.odds_text and self.cards:
+            todds = render_text(SMALL, self.odds_text, (255, 255, 180))
+            surf.blit(todds, (240, 130))
+
         self.card_rects = []
         x0 = 200
         y0 = 220
@@ -642,66 +1053,71 @@ class GameScreen(ScreenBase):
                 color = (255, 255, 180)
             pygame.draw.rect(surf, color, rect, border_radius=8)
             pygame.draw.rect(surf, (0, 0, 0), rect, 2, border_radius=8)
-            txt = FONT.render(card, True, (0, 0, 0))
+            txt = render_text(FONT, card, (0, 0, 0))
             surf.blit(txt, txt.get_rect(center=rect.center))
 
-        area = pygame.Rect(40, HEIGHT - 150, WIDTH - 80, 110)
-        pygame.draw.rect(surf, (0, 60, 0), area, border_radius=8)
-        pygame.draw.rect(surf, (0, 100, 0), area, 2, border_radius=8)
-
-        max_width = area.width - 20
-        wrapped_lines = []
-        for line in self.status_lines:
-            wrapped_lines.extend(wrap_text(line, SMALL, max_width))
-
-        y = area.y + 10
-        for line in wrapped_lines[-20:]:
-            txt = SMALL.render(line, True, (230, 230, 230))
-            if y + txt.get_height() > area.bottom - 10:
-                break
-            surf.blit(txt, (area.x + 10, y))
-            y += txt.get_height() + 4
-
         if self.showdown_info:
             winners = ", ".join(self.showdown_info.get("winners", []))
             desc = self.showdown_info.get("description", "")
-            txt = SMALL.render(
-                f"Último resultado: {winners} ({desc})", True, (255, 255, 0)
+            txt = render_text(
+                SMALL, f"Último resultado: {winners} ({desc})", (255, 255, 0)
             )
             surf.blit(txt, (40, 200))
 
-        hint = SMALL.render("ESC: Volver", True, (230, 230, 230))
-        surf.blit(hint, (40, HEIGHT - 30))
-
 
 # ---------- Gestor de pantallas ----------
+SCREEN_TYPES = {
+    "welcome": WelcomeScreen,
+    "instructions": InstructionsScreen,
+    "video": VideoScreen,
+    "settings": SettingsScreen,
+    "chat": ChatScreen,
+    "game": GameScreen,
+}
+
+
 class ScreenManager:
     def __init__(self):
         self.config = {"nick": "Anon", "server": "127.0.0.1:5000"}
         self.net_client = NetClient()
-
-        self.screens = {
-            "welcome": WelcomeScreen(self),
-            "instructions": InstructionsScreen(self),
-            "video": VideoScreen(self),
-            "settings": SettingsScreen(self),
-            "chat": ChatScreen(self),
-            "game": GameScreen(self),
+        # Los buzones existen desde el principio y se llenan aunque la
+        # pantalla no esté visible (o ni siquiera construida)
+        self.inboxes = {
+            "chat": self.net_client.subscribe("chat", "info"),
+            "game": self.net_client.subscribe("info", "state_delta", "showdown"),
         }
+
+        # cada pantalla se construye la primera vez que se visita
+        self.screens = {}
         self.current = "welcome"
 
+    def screen(self, name=None):
+        name = name or self.current
+        scr = self.screens.get(name)
+        if scr is None:
+            scr = self.screens[name] = SCREEN_TYPES[name](self)
+        return scr
+
     def goto(self, name):
-        if name in self.screens:
+        if name in SCREEN_TYPES:
             self.current = name
+            self.screen(name).invalidate()
+
+    def collect_dirty(self):
+        return self.screen().collect_dirty()
 
     def handle_event(self, e):
-        self.screens[self.current].handle_event(e)
+        self.screen().handle_event(e)
 
     def update(self, dt):
-        self.screens[self.current].update(dt)
+        self.screen().update(dt)
 
-    def draw(self, surf):
-        self.screens[self.current].draw(surf)
+    def draw(self, surf, rects=None):
+        # con rects solo se pinta dentro de su unión (el resto no cambió)
+        if rects:
+            surf.set_clip(rects[0].unionall(rects[1:]))
+        self.screen().draw(surf)
+        surf.set_clip(None)
 
     def shutdown(self):
         vid = self.screens.get("video")
@@ -711,15 +1127,96 @@ class ScreenManager:
             self.net_client.close()
 
 
+# ---------- Overlay de tiempos de frame (F3) ----------
+class FrameStats:
+    # Mide el trabajo real de cada frame (update + draw), sin contar la
+    # espera de CLOCK.tick
+    RECT = pygame.Rect(WIDTH - 460, 0, 460, 56)
+
+    def __init__(self, size=120):
+        self.samples = deque(maxlen=size)
+        self.visible = False
+        self.start = 0.0
+
+    def begin(self):
+        self.start = time.perf_counter()
+
+    def end(self):
+        self.samples.append(time.perf_counter() - self.start)
+
+    def draw(self, surf, net=None):
+        if not self.visible or not self.samples:
+            return
+        avg = sum(self.samples) / len(self.samples) * 1000
+        worst = max(self.samples) * 1000
+        text = (
+            f"frame {avg:.2f} ms (máx {worst:.2f}) | "
+            f"{CLOCK.get_fps():.0f} FPS | "
+            f"caché texto {TEXT_CACHE.hit_rate():.0%}"
+        )
+        txt = SMALL.render(text, True, (255, 255, 0), (0, 0, 0))
+        surf.blit(txt, txt.get_rect(topright=(WIDTH - 6, 6)))
+        if net is not None and net.sock:
+            sent = net.send_stats()
+            text = f"envío: {sent['messages']} msg en {sent['batches']} lotes"
+            if "p50_ms" in sent:
+                text += f" | p50 {sent['p50_ms']:.2f} ms, p99 {sent['p99_ms']:.2f} ms"
+            txt = SMALL.render(text, True, (255, 255, 0), (0, 0, 0))
+            surf.blit(txt, txt.get_rect(topright=(WIDTH - 6, 30)))
+
+
+# ---------- Arranque ----------
+def solve_hand(cards):
+    from game.discard import solve
+
+    solve(cards)
+
+
+def warm_up():
+    # Se lanza tras el primer frame: precarga los módulos pesados para que
+    # abrir el video, el juego o "Acerca de" no congele la interfaz
+    try:
+        import webbrowser
+        import game.equity, game.discard
+        from moviepy import VideoFileClip
+    except Exception as e:
+        print("Precarga incompleta:", e)
+
+
 # ---------- Loop principal ----------
 def main():
     global SCREEN
     mgr = ScreenManager()
+    stats = FrameStats()
     fullscreen = False
+    # --full-redraw: modo anterior (todo el frame y flip en cada tick)
+    full_redraw = "--full-redraw" in sys.argv
+    # --startup-probe: imprime el tiempo hasta el primer frame y sale
+    # (lo usa bench.startup)
+    probe = "--startup-probe" in sys.argv
+    warm = None
+    last_change = time.perf_counter()
+
+    def presented():
+        nonlocal warm
+        if warm is not None:
+            return
+        first_frame = time.perf_counter() - STARTED
+        warm = threading.Thread(target=warm_up, daemon=True)
+        warm.start()
+        if probe:
+            print(f"first_frame {first_frame:.4f}", flush=True)
+            warm.join()
+            print(f"warm_up {time.perf_counter() - STARTED:.4f}", flush=True)
+            mgr.shutdown()
+            pygame.quit()
+            sys.exit(0)
 
     while True:
-        dt = CLOCK.tick(60) / 1000.0
+        idle = time.perf_counter() - last_change > IDLE_AFTER
+        dt = CLOCK.tick(IDLE_FPS if idle else ACTIVE_FPS) / 1000.0
         for e in pygame.event.get():
+            last_change = time.perf_counter()
             if e.type == pygame.QUIT:
                 mgr.shutdown()
                 pygame.quit()
@@ -732,11 +1229,35 @@ def main():
                     )
                 else:
                     SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+                mgr.screen().invalidate()
+            elif e.type == pygame.KEYDOWN and e.key == pygame.K_F3:
+                stats.visible = not stats.visible
+                # al ocultarlo hay que repintar la pantalla debajo
+                mgr.screen().invalidate(FrameStats.RECT)
             mgr.handle_event(e)
 
+        stats.begin()
         mgr.update(dt)
-        mgr.draw(SCREEN)
-        pygame.display.flip()
+        rects = mgr.collect_dirty()
+        if full_redraw:
+            mgr.draw(SCREEN)
+            stats.end()
+            stats.draw(SCREEN, mgr.net_client)
+            pygame.display.flip()
+            presented()
+            continue
+        if rects:
+            last_change = time.perf_counter()
+        if stats.visible:
+            rects.append(FrameStats.RECT)
+        if not rects:
+            # nada cambió: no se dibuja ni se envía nada a la pantalla
+            continue
+        mgr.draw(SCREEN, rects)
+        stats.end()
+        stats.draw(SCREEN, mgr.net_client)
+        pygame.display.update(rects)
+        presented()
 
 
 if __name__ == "__main__":
@@ -1,52 +1,352 @@
-import socket, threading, json, time
-from queue import Queue, Empty
+import queue, random, socket, threading, time
+from collections import deque
+
+from net.protocol import JSON, BINARY, BINARY_VERSION, PROTOCOL_VERSION
+
+# Tipos de mensaje que describen un estado completo: basta con el último
+LATEST_TOPICS = ("hand", "game_state")
+TOPIC_BUFFER = 256
+
+CONNECT_TIMEOUT = 5.0
+# Reconexión: espera inicial, máxima y número de intentos
+RECONNECT_BASE = 0.5
+RECONNECT_MAX = 10.0
+RECONNECT_ATTEMPTS = 10
+
+
+class Subscription:
+    # Búfer acotado con los mensajes de unos tipos. Si se llena se descartan
+    # los más antiguos y se cuentan en `dropped`.
+    def __init__(self, topics, maxlen=TOPIC_BUFFER):
+        self.topics = topics
+        self.items = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.cond = threading.Condition()
+
+    def put(self, msg):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(msg)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        # espera hasta `timeout` segundos; None si no llegó nada
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+            return self.items.popleft() if self.items else None
+
+    def get_nowait(self):
+        with self.cond:
+            return self.items.popleft() if self.items else None
+
+    def drain(self):
+        with self.cond:
+            items = list(self.items)
+            self.items.clear()
+        return items
+
+
+class Dispatcher:
+    # Reparte cada mensaje por su "type" entre las suscripciones de ese
+    # tipo (cada una recibe su copia). Los tipos de LATEST_TOPICS quedan
+    # además en una ranura (serial, mensaje) que se lee en O(1).
+    def __init__(self, latest=LATEST_TOPICS):
+        self.lock = threading.Lock()
+        self.latest_topics = frozenset(latest)
+        self.slots = {}
+        self.by_topic = {}
+        self.wildcard = []
+
+    def subscribe(self, *topics, maxlen=TOPIC_BUFFER):
+        # sin tipos: recibe todos los mensajes
+        sub = Subscription(frozenset(topics), maxlen)
+        with self.lock:
+            if not topics:
+                self.wildcard.append(sub)
+            for topic in topics:
+                self.by_topic.setdefault(topic, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            if sub in self.wildcard:
+                self.wildcard.remove(sub)
+            for topic in sub.topics:
+                subs = self.by_topic.get(topic, [])
+                if sub in subs:
+                    subs.remove(sub)
+
+    def publish(self, msg):
+        topic = msg.get("type")
+        with self.lock:
+            if topic in self.latest_topics:
+                serial = self.slots.get(topic, (0, None))[0] + 1
+                self.slots[topic] = (serial, msg)
+            subs = self.by_topic.get(topic, []) + self.wildcard
+        for sub in subs:
+            sub.put(msg)
+
+    def latest(self, topic):
+        # (serial, mensaje); el serial crece con cada mensaje nuevo y es 0
+        # mientras no haya llegado ninguno
+        return self.slots.get(topic, (0, None))
+
+    def reset(self):
+        with self.lock:
+            self.slots = {
+                topic: (serial, None) for topic, (serial, _) in self.slots.items()
+            }
+
+
+class SendStats:
+    # Latencia desde send() hasta que el lote sale por el socket, sobre las
+    # últimas `window` muestras
+    def __init__(self, window=512):
+        self.samples = deque(maxlen=window)
+        self.messages = 0
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def record(self, queued_at, sent_at):
+        with self.lock:
+            self.messages += len(queued_at)
+            self.batches += 1
+            self.samples.extend(sent_at - t for t in queued_at)
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            messages, batches = self.messages, self.batches
+        result = {"messages": messages, "batches": batches}
+        if samples:
+            pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+            result.update(
+                p50_ms=pick(0.50) * 1000,
+                p99_ms=pick(0.99) * 1000,
+                max_ms=samples[-1] * 1000,
+            )
+        return result
+
 
 class NetClient:
-    def __init__(self):
+    def __init__(self, compact=True, reconnect=True):
         self.sock = None
-        self.incoming = Queue()
+        self.rfile = None
+        self.codec = JSON
+        self.compact = compact
+        self.reconnect = reconnect
+        self.dispatcher = Dispatcher()
         self.running = False
+        self.outbox = None
+        self.sender = None
+        self.stats = SendStats()
+        self.address = None  # (host, port, nick)
+        self.session = None
+        self.reconnects = 0
+        self.connected = threading.Event()
+        self.stopped = threading.Event()
 
     def connect(self, host, port, nick):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((host, port))
-        self.running = True
-
-        # enviamos nick
-        self.send({"type": "hello", "nick": nick})
+        if self.outbox is not None:
+            self.close()
+        self.address = (host, port, nick)
+        self.session = None
+        self.stopped.clear()
+        # el estado de una conexión anterior ya no vale
+        self.dispatcher.reset()
+        self._open()
 
+        self.running = True
+        self.outbox = queue.Queue()
+        self.sender = threading.Thread(
+            target=self._send_loop, args=(self.outbox,), daemon=True
+        )
+        self.sender.start()
         t = threading.Thread(target=self._recv_loop, daemon=True)
         t.start()
 
+    def _open(self):
+        host, port, nick = self.address
+        sock = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        sock.settimeout(None)
+        # los mensajes son pequeños e interactivos y ya se agrupan en el
+        # hilo emisor: no tiene sentido esperar a Nagle
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.rfile = sock.makefile("rb")
+        self.codec = JSON
+
+        # enviamos nick (y, si se quiere, la versión de protocolo compacta
+        # y la sesión a reanudar); el saludo va directo porque hay que leer
+        # la respuesta
+        hello = {"type": "hello", "nick": nick}
+        if self.compact:
+            hello["proto"] = PROTOCOL_VERSION
+        if self.session:
+            hello["session"] = self.session
+        try:
+            sock.sendall(JSON.encode(hello))
+            if self.compact:
+                self._negotiate()
+        except Exception:
+            self._close_socket()
+            raise
+        self.connected.set()
+
+    def _negotiate(self):
+        # Un servidor nuevo responde primero con {"type": "proto"}; uno
+        # antiguo manda directamente otro mensaje y seguimos en JSON.
+        self.sock.settimeout(5)
+        try:
+            first = JSON.read(self.rfile)
+        finally:
+            self.sock.settimeout(None)
+        if not isinstance(first, dict):
+            return
+        if first.get("type") == "proto" and first.get("version") == BINARY_VERSION:
+            self.codec = BINARY
+        else:
+            self._deliver(first)
+
+    def _deliver(self, msg):
+        mtype = msg.get("type")
+        if mtype == "ping":
+            # latido del servidor: sin respuesta, acabaría cerrándonos
+            self.send({"type": "pong"})
+            return
+        if mtype == "session":
+            self.session = msg.get("token")
+        self.dispatcher.publish(msg)
+
     def _recv_loop(self):
-        f = self.sock.makefile("r", encoding="utf-8", newline="\n")
-        for line in f:
-            if not self.running:
-                break
+        while True:
             try:
-                msg = json.loads(line)
-            except json.JSONDecodeError:
+                msg = self.codec.read(self.rfile)
+            except (EOFError, OSError, ValueError, AttributeError):
+                if not self._reconnect():
+                    break
                 continue
-            self.incoming.put(msg)
+            if isinstance(msg, dict):
+                self._deliver(msg)
         self.running = False
 
+    def _reconnect(self):
+        # Reintenta con espera exponencial (y algo de azar, para que no
+        # vuelvan todos los clientes a la vez) hasta que se llame a close().
+        # Con la sesión, el servidor devuelve el mismo asiento y la mano.
+        self.connected.clear()
+        self._close_socket()
+        if self.stopped.is_set() or not self.reconnect:
+            return False
+        self.dispatcher.publish({
+            "type": "info", "text": "Conexión perdida; reintentando...",
+        })
+        delay = RECONNECT_BASE
+        for _ in range(RECONNECT_ATTEMPTS):
+            if self.stopped.wait(delay * random.uniform(0.5, 1.0)):
+                return False
+            try:
+                self._open()
+            except (OSError, ValueError, EOFError):
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+            self.reconnects += 1
+            self.dispatcher.publish({"type": "info", "text": "Reconectado."})
+            return True
+        self.dispatcher.publish({
+            "type": "info", "text": "No se pudo reconectar con el servidor.",
+        })
+        return False
+
+    def _send_loop(self, outbox):
+        # Codifica y envía fuera del hilo de la interfaz; lo que se haya
+        # acumulado mientras tanto sale en un único sendall. Si la conexión
+        # cae, el lote se guarda y se reenvía al reconectar.
+        batch = []
+        while True:
+            if not batch:
+                batch.append(outbox.get())
+            while batch[-1] is not None:
+                try:
+                    batch.append(outbox.get_nowait())
+                except queue.Empty:
+                    break
+            done = batch[-1] is None
+            if done:
+                batch.pop()
+            if batch:
+                while not self.connected.wait(0.5):
+                    if self.stopped.is_set():
+                        return
+                sock, codec = self.sock, self.codec
+                try:
+                    sock.sendall(b"".join(codec.encode(obj) for _, obj in batch))
+                except (OSError, AttributeError):
+                    if self.stopped.is_set():
+                        return
+                    # despierta al lector para que reconecte
+                    self.connected.clear()
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except (OSError, AttributeError):
+                        pass
+                    if done:
+                        batch.append(None)
+                    continue
+                self.stats.record([t for t, _ in batch], time.perf_counter())
+                batch = []
+            if done:
+                return
+
     def send(self, obj):
-        if not self.sock:
+        # solo encola: nunca bloquea a quien llama. Durante una reconexión
+        # los mensajes esperan en la cola.
+        if self.outbox is None:
             return
-        data = json.dumps(obj) + "\n"
-        self.sock.sendall(data.encode("utf-8"))
+        self.outbox.put_nowait((time.perf_counter(), obj))
 
-    def get_nowait(self):
-        try:
-            return self.incoming.get_nowait()
-        except Empty:
-            return None
+    def send_stats(self):
+        stats = self.stats.snapshot()
+        stats["queued"] = self.outbox.qsize() if self.outbox else 0
+        return stats
 
-    def close(self):
-        self.running = False
+    def subscribe(self, *topics, maxlen=TOPIC_BUFFER):
+        return self.dispatcher.subscribe(*topics, maxlen=maxlen)
+
+    def latest(self, topic):
+        return self.dispatcher.latest(topic)
+
+    def _close_socket(self):
+        sock, rfile = self.sock, self.rfile
+        self.sock = None
+        if sock is None:
+            return
+        try:
+            # shutdown avisa al servidor aunque el makefile siga abierto
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         try:
-            if self.sock:
-                self.sock.close()
+            rfile.close()
+            sock.close()
         except:
             pass
-        self.sock = None
\ No newline at end of file
+
+    def close(self):
+        # Salida voluntaria: "bye" le dice al servidor que no guarde el
+        # asiento, y se espera un momento a que salga lo pendiente
+        self.running = False
+        outbox, self.outbox = self.outbox, None
+        if outbox is not None:
+            if self.connected.is_set():
+                outbox.put_nowait((time.perf_counter(), {"type": "bye"}))
+            else:
+                self.stopped.set()
+            outbox.put_nowait(None)
+            if self.sender is not None:
+                self.sender.join(timeout=1.0)
+        self.stopped.set()
+        self.connected.clear()
+        self._close_socket()
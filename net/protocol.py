@@ -0,0 +1,267 @@
+import json
+import struct
+
+# Versión 1: JSON por líneas. Versión 2: tramas binarias con prefijo de
+# longitud (varint), claves y valores frecuentes como un byte y cartas
+# como un byte (índice 0..51). El cliente la pide con "proto" en el hello;
+# el servidor confirma con {"type": "proto"} en JSON y desde ese momento
+# ambos lados usan tramas binarias.
+JSON_VERSION = 1
+BINARY_VERSION = 2
+PROTOCOL_VERSION = BINARY_VERSION
+
+MAX_FRAME = 1 << 20
+MAX_DEPTH = 32
+
+_CARDS = [r + s for s in "CDHS" for r in "23456789TJQKA"]
+_CARD_ID = {c: i for i, c in enumerate(_CARDS)}
+
+# Solo se puede añadir al final: el índice es parte del protocolo
+STRINGS = [
+    # claves
+    "type", "nick", "msg", "from", "text", "cards", "can_draw", "phase",
+    "players", "round", "room", "rooms", "winners", "description", "hands",
+    "proto", "version",
+    # tipos de mensaje
+    "hello", "chat", "info", "join_game", "draw", "hand", "game_state",
+    "showdown", "list_rooms",
+    # fases y descripciones de mano
+    "waiting", "Escalera de color", "Póker", "Full", "Color", "Escalera",
+    "Trío", "Doble par", "Par", "Carta alta",
+    # estado incremental
+    "state_delta", "resync", "ops", "op", "player", "join", "leave",
+    # sesiones
+    "session", "token", "resumed", "bye",
+    # latidos
+    "ping", "pong",
+]
+_STRING_ID = {s: i for i, s in enumerate(STRINGS)}
+
+# Etiquetas de valor (un byte). 0x80..0xFF: entero 0..127 en línea.
+T_NONE, T_FALSE, T_TRUE, T_INT, T_FLOAT = 0x00, 0x01, 0x02, 0x03, 0x04
+T_STR, T_REF, T_CARD, T_CARDS, T_LIST, T_DICT = 0x05, 0x06, 0x07, 0x08, 0x09, 0x0A
+_SMALL_INT = 0x80
+
+_FLOAT = struct.Struct(">d")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def _put_varint(n, out):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ProtocolError("varint truncado")
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+        if shift > 63:
+            raise ProtocolError("varint demasiado largo")
+
+
+def _pack(v, out):
+    if v is None:
+        out.append(T_NONE)
+    elif v is True:
+        out.append(T_TRUE)
+    elif v is False:
+        out.append(T_FALSE)
+    elif isinstance(v, int):
+        if 0 <= v < 0x80:
+            out.append(_SMALL_INT | v)
+        else:
+            out.append(T_INT)
+            _put_varint(-2 * v - 1 if v < 0 else 2 * v, out)
+    elif isinstance(v, float):
+        out.append(T_FLOAT)
+        out += _FLOAT.pack(v)
+    elif isinstance(v, str):
+        idx = _STRING_ID.get(v)
+        if idx is not None:
+            out.append(T_REF)
+            out.append(idx)
+            return
+        card = _CARD_ID.get(v)
+        if card is not None:
+            out.append(T_CARD)
+            out.append(card)
+            return
+        data = v.encode("utf-8")
+        out.append(T_STR)
+        _put_varint(len(data), out)
+        out += data
+    elif isinstance(v, (list, tuple)):
+        ids = [_CARD_ID.get(x) if isinstance(x, str) else None for x in v]
+        if v and None not in ids:
+            out.append(T_CARDS)
+            _put_varint(len(ids), out)
+            out += bytes(ids)
+            return
+        out.append(T_LIST)
+        _put_varint(len(v), out)
+        for x in v:
+            _pack(x, out)
+    elif isinstance(v, dict):
+        out.append(T_DICT)
+        _put_varint(len(v), out)
+        for k, x in v.items():
+            _pack(k, out)
+            _pack(x, out)
+    else:
+        raise TypeError(f"tipo no serializable: {type(v).__name__}")
+
+
+def _unpack(buf, pos, depth=0):
+    if depth > MAX_DEPTH:
+        raise ProtocolError("anidamiento excesivo")
+    if pos >= len(buf):
+        raise ProtocolError("mensaje truncado")
+    tag = buf[pos]
+    pos += 1
+    if tag & _SMALL_INT:
+        return tag & 0x7F, pos
+    if tag == T_NONE:
+        return None, pos
+    if tag == T_TRUE:
+        return True, pos
+    if tag == T_FALSE:
+        return False, pos
+    if tag == T_INT:
+        z, pos = _get_varint(buf, pos)
+        return (z >> 1) ^ -(z & 1), pos
+    if tag == T_FLOAT:
+        if pos + 8 > len(buf):
+            raise ProtocolError("mensaje truncado")
+        return _FLOAT.unpack_from(buf, pos)[0], pos + 8
+    if tag == T_REF:
+        if pos >= len(buf) or buf[pos] >= len(STRINGS):
+            raise ProtocolError("referencia de texto inválida")
+        return STRINGS[buf[pos]], pos + 1
+    if tag == T_CARD:
+        if pos >= len(buf) or buf[pos] >= 52:
+            raise ProtocolError("carta inválida")
+        return _CARDS[buf[pos]], pos + 1
+    if tag == T_STR:
+        n, pos = _get_varint(buf, pos)
+        if pos + n > len(buf):
+            raise ProtocolError("mensaje truncado")
+        return bytes(buf[pos:pos + n]).decode("utf-8"), pos + n
+    if tag == T_CARDS:
+        n, pos = _get_varint(buf, pos)
+        if pos + n > len(buf) or any(b >= 52 for b in buf[pos:pos + n]):
+            raise ProtocolError("lista de cartas inválida")
+        return [_CARDS[b] for b in buf[pos:pos + n]], pos + n
+    if tag == T_LIST:
+        n, pos = _get_varint(buf, pos)
+        items = []
+        for _ in range(n):
+            x, pos = _unpack(buf, pos, depth + 1)
+            items.append(x)
+        return items, pos
+    if tag == T_DICT:
+        n, pos = _get_varint(buf, pos)
+        d = {}
+        for _ in range(n):
+            k, pos = _unpack(buf, pos, depth + 1)
+            if isinstance(k, (list, dict)):
+                raise ProtocolError("clave de diccionario inválida")
+            x, pos = _unpack(buf, pos, depth + 1)
+            d[k] = x
+        return d, pos
+    raise ProtocolError(f"etiqueta desconocida 0x{tag:02x}")
+
+
+def _check_length(n):
+    if n > MAX_FRAME:
+        raise ProtocolError("trama demasiado grande")
+    return n
+
+
+class JsonCodec:
+    # Texto JSON, un mensaje por línea. read() devuelve None si la línea no
+    # es JSON válido (se ignora, como antes) y lanza EOFError al cerrar.
+    version = JSON_VERSION
+
+    def encode(self, obj):
+        return (json.dumps(obj) + "\n").encode("utf-8")
+
+    def decode(self, line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def read(self, f):
+        line = f.readline()
+        if not line:
+            raise EOFError
+        return self.decode(line)
+
+    async def read_async(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise EOFError
+        return self.decode(line)
+
+
+class BinaryCodec:
+    version = BINARY_VERSION
+
+    def encode(self, obj):
+        body = bytearray()
+        _pack(obj, body)
+        out = bytearray()
+        _put_varint(len(body), out)
+        return bytes(out + body)
+
+    def decode(self, payload):
+        obj, pos = _unpack(payload, 0)
+        if pos != len(payload):
+            raise ProtocolError("bytes sobrantes en la trama")
+        return obj
+
+    def read(self, f):
+        n = shift = 0
+        while True:
+            b = f.read(1)
+            if not b:
+                raise EOFError
+            n |= (b[0] & 0x7F) << shift
+            if not b[0] & 0x80:
+                break
+            shift += 7
+            if shift > 28:
+                raise ProtocolError("longitud de trama inválida")
+        payload = f.read(_check_length(n))
+        if len(payload) < n:
+            raise EOFError
+        return self.decode(payload)
+
+    async def read_async(self, reader):
+        n = shift = 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            n |= (b & 0x7F) << shift
+            if not b & 0x80:
+                break
+            shift += 7
+            if shift > 28:
+                raise ProtocolError("longitud de trama inválida")
+        return self.decode(await reader.readexactly(_check_length(n)))
+
+
+JSON = JsonCodec()
+BINARY = BinaryCodec()
+CODECS = {JSON_VERSION: JSON, BINARY_VERSION: BINARY}
@@ -1,59 +1,208 @@
+import argparse
+import array
+import asyncio
+import atexit
+import errno
+import io
+import os
+import queue
+import secrets
+import signal
 import socket
+import subprocess
+import sys
+import tempfile
 import threading
-import json
+import time
+from collections import deque
 
-from game.logic import make_deck, deal, best_hand, hand_description
+from game.history import HandHistory
+from game.logic import (
+    Deck, DeckPool, make_rng, best_hand, hand_description, hand_strength,
+)
+from net.protocol import JSON, BINARY, BINARY_VERSION, CODECS, PROTOCOL_VERSION
 
-clients = {}
+clients = {}  # conexión -> {"nick": ..., "session": token}
+nick_index = {}  # nick -> conexión (inverso de clients)
 clients_lock = threading.Lock()
 
+# Sesiones: el hello devuelve un token; si la conexión cae, el jugador
+# conserva nick, asiento y mano durante SESSION_GRACE segundos y puede
+# recuperarlos reconectando con ese token.
+sessions = {}  # token -> {"nick", "conn" (None si está caída), "timer"}
+session_of = {}  # nick -> token
+SESSION_GRACE = 30.0
+
+# Cola de salida por conexión: al pasar de OUTBOX_HIGH_WATER mensajes se
+# deja de leer de ese cliente; al llegar a OUTBOX_SIZE se le desconecta.
+OUTBOX_SIZE = 256
+OUTBOX_HIGH_WATER = 64
+WRITE_CHUNK = 64 * 1024
+
+MAX_PLAYERS = 4
+
+# Barajado: por defecto cada mesa tiene su propio generador. --seed lo hace
+# reproducible (semilla + número de mesa), --secure-rng usa el del sistema
+# y --deck-pool baraja mazos por adelantado en un hilo compartido.
+RNG_SEED = None
+SECURE_RNG = False
+DECK_POOL = None
+
+# --history DIR: cada ronda terminada se guarda en el historial de manos
+# (game.history), escrito desde un hilo propio
+HISTORY = None
+
+# Latidos: cada HEARTBEAT_INTERVAL se manda "ping" a las conexiones que no
+# han dicho nada en ese tiempo y se cierran las que llevan IDLE_TIMEOUT en
+# silencio (conexiones medio abiertas). DRAW_TIMEOUT limita la fase de
+# descarte: quien no haya cambiado cartas se planta.
+HEARTBEAT_INTERVAL = 15.0
+IDLE_TIMEOUT = 45.0
+DRAW_TIMEOUT = 60.0
+connections = set()  # todas las conexiones abiertas, con o sin hello
+
+# Modo multiproceso (--workers): el Shard de este worker, o None con un
+# solo proceso. Ver "Modo multiproceso" más abajo.
+SHARD = None
+
+
+def room_seed(room_id):
+    # semilla de la secuencia de mazos de la mesa, si es reproducible
+    if SECURE_RNG or RNG_SEED is None:
+        return None
+    return f"{RNG_SEED}:{room_id}"
+
+
+def room_rng(room_id):
+    if SECURE_RNG:
+        return make_rng(secure=True)
+    return make_rng(room_seed(room_id))
+
 
 class GameRoom:
-    def __init__(self):
+    def __init__(self, room_id=0, rng=None):
+        self.room_id = room_id
         self.lock = threading.Lock()
         self.players = []
         self.hands = {}
         self.has_drawn = set()
         self.phase = "waiting"
-        self.deck = []
+        self.seed = room_seed(room_id)
+        self.deck = Deck(rng if rng is not None else room_rng(room_id))
         self.round_number = 0
+        self.version = 0
+        self.deadline = None
+        # datos de la ronda en curso para el historial
+        self.dealt = {}
+        self.draws = []
+        self.timeouts = []
 
     def to_state_dict(self):
+        # Instantánea completa: solo al entrar en la mesa o si el cliente
+        # pide "resync". El resto de cambios viajan como state_delta.
         return {
             "type": "game_state",
+            "room": self.room_id,
+            "version": self.version,
             "phase": self.phase,
             "players": self.players,
             "round": self.round_number,
         }
 
+    def emit_delta(self, ops, exclude=None):
+        # Cada delta sube la versión en uno; si el cliente ve un salto,
+        # pide la instantánea de nuevo.
+        self.version += 1
+        msg = {
+            "type": "state_delta",
+            "room": self.room_id,
+            "version": self.version,
+            "ops": ops,
+        }
+        if exclude is None:
+            self.broadcast(msg)
+        else:
+            broadcast_to([p for p in self.players if p != exclude], msg)
+        if SHARD is not None:
+            SHARD.room_changed(self.room_id, self.summary())
+
+    def phase_op(self):
+        return {"op": "phase", "phase": self.phase, "round": self.round_number}
+
+    def summary(self):
+        return {
+            "room": self.room_id,
+            "phase": self.phase,
+            "players": list(self.players),
+        }
+
+    def is_open(self):
+        return self.phase == "waiting" and len(self.players) < MAX_PLAYERS
+
+    def broadcast(self, obj):
+        # solo a los jugadores de esta mesa
+        broadcast_to(self.players, obj)
+
     def add_player(self, nick):
         with self.lock:
             if nick not in self.players:
                 self.players.append(nick)
+                self.emit_delta([{"op": "join", "player": nick}], exclude=nick)
+            send_to_nick(nick, self.to_state_dict())
             if self.phase == "waiting" and len(self.players) >= 2:
                 self.start_round()
 
     def remove_player(self, nick):
         with self.lock:
+            ops = []
             if nick in self.players:
                 self.players.remove(nick)
                 self.hands.pop(nick, None)
                 self.has_drawn.discard(nick)
+                ops.append({"op": "leave", "player": nick})
             if len(self.players) < 2:
-                self.phase = "waiting"
-                self.deck = []
+                if self.phase != "waiting":
+                    self.phase = "waiting"
+                    ops.append(self.phase_op())
+                if self.deadline is not None:
+                    self.deadline.cancel()
+                    self.deadline = None
                 self.hands.clear()
                 self.has_drawn.clear()
-                broadcast(self.to_state_dict())
+            if ops:
+                self.emit_delta(ops)
+            # si solo faltaba él por cambiar cartas, la ronda termina ya
+            if self.phase == "draw" and self.has_drawn >= set(self.players):
+                self.showdown()
+
+    def resume_player(self, nick):
+        # Tras reanudar la sesión: instantánea y mano guardada
+        with self.lock:
+            send_to_nick(nick, self.to_state_dict())
+            cards = self.hands.get(nick)
+            if cards:
+                send_to_nick(nick, {
+                    "type": "hand",
+                    "cards": cards,
+                    "can_draw": self.phase == "draw" and nick not in self.has_drawn,
+                })
 
     def start_round(self):
         self.round_number += 1
         self.phase = "draw"
-        self.deck = make_deck()
-        import random
-        random.shuffle(self.deck)
-        self.hands = {p: deal(self.deck, 5) for p in self.players}
+        if DECK_POOL is not None:
+            self.deck = DECK_POOL.get()
+        else:
+            self.deck.reset()
+        self.hands = {p: self.deck.deal(5) for p in self.players}
         self.has_drawn = set()
+        self.dealt = {p: list(c) for p, c in self.hands.items()}
+        self.draws = []
+        self.timeouts = []
+        if DRAW_TIMEOUT > 0:
+            self.deadline = call_later(
+                DRAW_TIMEOUT, self.draw_deadline, self.round_number
+            )
 
         for nick, cards in self.hands.items():
             send_to_nick(nick, {
@@ -62,11 +211,11 @@ class GameRoom:
                 "can_draw": True,
             })
 
-        broadcast({
+        self.broadcast({
             "type": "info",
             "text": f"Comienza la ronda {self.round_number}. Cada jugador tiene 5 cartas.",
         })
-        broadcast(self.to_state_dict())
+        self.emit_delta([self.phase_op()])
 
     def player_draw(self, nick, indices):
         with self.lock:
@@ -87,10 +236,10 @@ class GameRoom:
             cards = self.hands.get(nick)
             if not cards:
                 return
-            for i in indices:
-                if not self.deck:
-                    break
-                cards[i] = self.deck.pop()
+            new = self.deck.deal(min(len(indices), len(self.deck)))
+            for i, card in zip(indices, new):
+                cards[i] = card
+            self.draws.append((nick, indices, new))
             self.hands[nick] = cards
             self.has_drawn.add(nick)
 
@@ -100,7 +249,7 @@ class GameRoom:
                 "can_draw": False,
             })
 
-            broadcast({
+            self.broadcast({
                 "type": "info",
                 "text": f"{nick} ha cambiado {len(indices)} carta(s).",
             })
@@ -108,131 +257,1231 @@ class GameRoom:
             if self.has_drawn == set(self.players):
                 self.showdown()
 
+    def draw_deadline(self, round_number):
+        # Se acabó el tiempo: quien no haya cambiado (o esté desconectado)
+        # se queda con su mano y la ronda termina
+        with self.lock:
+            self.deadline = None
+            if self.phase != "draw" or self.round_number != round_number:
+                return
+            for nick in self.players:
+                if nick in self.has_drawn:
+                    continue
+                self.has_drawn.add(nick)
+                self.timeouts.append(nick)
+                send_to_nick(nick, {
+                    "type": "hand",
+                    "cards": self.hands.get(nick, []),
+                    "can_draw": False,
+                })
+                self.broadcast({
+                    "type": "info",
+                    "text": f"{nick} se planta (tiempo agotado).",
+                })
+            self.showdown()
+
+    def history_record(self, winners):
+        # la ronda en el formato de game.history (jugadores por índice)
+        players = list(self.dealt)
+        seat = {p: i for i, p in enumerate(players)}
+        return {
+            "t": time.time(),
+            "room": self.room_id,
+            "round": self.round_number,
+            "seed": self.seed if DECK_POOL is None else None,
+            "players": players,
+            "dealt": list(self.dealt.values()),
+            "draws": [[seat[n], i, c] for n, i, c in self.draws if n in seat],
+            "timeouts": [seat[n] for n in self.timeouts if n in seat],
+            "left": [seat[p] for p in players if p not in self.hands],
+            "winners": [seat[w] for w in winners],
+            "strength": hand_strength(self.hands[winners[0]]),
+        }
+
     def showdown(self):
+        if self.deadline is not None:
+            self.deadline.cancel()
+            self.deadline = None
         self.phase = "showdown"
         score, winners = best_hand(self.hands)
         desc = hand_description(self.hands[winners[0]])
-        broadcast({
+        if HISTORY is not None:
+            HISTORY.record(self.history_record(winners))
+        self.broadcast({
             "type": "info",
             "text": f"Fin de la ronda. Manos reveladas.",
         })
-        broadcast({
+        self.broadcast({
             "type": "showdown",
             "winners": winners,
             "description": desc,
             "hands": self.hands,
         })
-        broadcast(self.to_state_dict())
+        self.emit_delta([self.phase_op()])
         self.phase = "waiting"
-        self.deck = []
         self.hands = {}
         self.has_drawn.clear()
+        self.emit_delta([self.phase_op()])
+
+
+class RoomManager:
+    # Registro de mesas: crea, lista y elimina salas vacías, y recuerda en
+    # qué sala está cada jugador para enrutar join_game/draw.
+    def __init__(self, first_id=1, step=1):
+        self.lock = threading.Lock()
+        self.rooms = {}
+        self.player_room = {}
+        self.next_id = first_id
+        self.step = step  # con varios workers, cada uno numera a saltos
+
+    def create(self):
+        room = GameRoom(self.next_id)
+        self.rooms[room.room_id] = room
+        self.next_id += self.step
+        return room
 
+    def get(self, room_id):
+        return self.rooms.get(room_id)
 
-game = GameRoom()
+    def room_of(self, nick):
+        with self.lock:
+            return self.rooms.get(self.player_room.get(nick))
+
+    def list_rooms(self):
+        with self.lock:
+            return [room.summary() for room in self.rooms.values()]
+
+    def open_room(self):
+        with self.lock:
+            return next((r for r in self.rooms.values() if r.is_open()), None)
+
+    def join(self, nick, room_id=None):
+        # Sin room_id se usa la primera mesa abierta o se crea una nueva.
+        # Devuelve None si la sala pedida no existe o está llena.
+        with self.lock:
+            current = self.rooms.get(self.player_room.get(nick))
+            if room_id is not None:
+                try:
+                    room = self.rooms.get(int(room_id))
+                except (TypeError, ValueError):
+                    return None
+                if room is None:
+                    return None
+                if room is not current and len(room.players) >= MAX_PLAYERS:
+                    return None
+            elif current is not None:
+                room = current
+            else:
+                room = next(
+                    (r for r in self.rooms.values() if r.is_open()), None
+                ) or self.create()
+
+            if current is not None and current is not room:
+                self._leave(nick)
+            self.player_room[nick] = room.room_id
+            room.add_player(nick)
+            return room
+
+    def leave(self, nick):
+        with self.lock:
+            self._leave(nick)
+
+    def _leave(self, nick):
+        room = self.rooms.get(self.player_room.pop(nick, None))
+        if room is None:
+            return
+        room.remove_player(nick)
+        self.reap(room)
+
+    def reap(self, room):
+        if not room.players:
+            self.rooms.pop(room.room_id, None)
+            if SHARD is not None:
+                SHARD.room_changed(room.room_id, None)
+
+
+rooms = RoomManager()
+
+
+def _drop(conn):
+    # llamar con clients_lock tomado
+    info = clients.pop(conn, None)
+    if info and nick_index.get(info.get("nick")) is conn:
+        del nick_index[info["nick"]]
+
+
+def _send(conn, obj, cache):
+    # llamar con clients_lock tomado. `cache` guarda el mensaje ya
+    # codificado por códec, así cada formato se serializa una sola vez.
+    codec = conn.codec
+    data = cache.get(codec)
+    if data is None:
+        data = cache[codec] = codec.encode(obj)
+    try:
+        conn.sendall(data)
+    except:
+        # solo se cierra: al terminar, el lector de la conexión llama a
+        # client_disconnected, que deja el asiento o abre el periodo de
+        # gracia como en cualquier otra desconexión
+        try:
+            conn.close()
+        except:
+            pass
+
+
+def register_nick(conn, nick):
+    # Asocia nick <-> conexión. Si el nick ya pertenece a otra conexión (o
+    # a una sesión caída que aún puede volver) se le añade un sufijo (#2,
+    # #3...) en vez de pisar al primero. Devuelve el nick definitivo.
+    with clients_lock:
+        _end_session(clients.get(conn, {}).get("session"))
+        _drop(conn)
+        final = nick
+        n = 2
+        while final in nick_index or final in session_of:
+            final = f"{nick}#{n}"
+            n += 1
+        clients[conn] = {"nick": final}
+        nick_index[final] = conn
+    return final
+
+
+def _thread_call_later(delay, fn, *args):
+    timer = threading.Timer(delay, fn, args)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+# Programa fn(*args) tras `delay` segundos; devuelve algo con cancel().
+# El modo asyncio lo sustituye por loop.call_later para que todo corra en
+# el hilo del bucle.
+call_later = _thread_call_later
+
+
+def _end_session(token):
+    # llamar con clients_lock tomado
+    session = sessions.pop(token, None)
+    if session is None:
+        return
+    if session["timer"] is not None:
+        session["timer"].cancel()
+    if session_of.get(session["nick"]) == token:
+        del session_of[session["nick"]]
+
+
+def open_session(conn, token, wanted):
+    # Devuelve (nick, token, reanudada). Un token vivo recupera su nick (y
+    # con él asiento y mano); si no, se registra `wanted` con token nuevo.
+    old = None
+    with clients_lock:
+        session = sessions.get(token) if isinstance(token, str) else None
+        if session is not None:
+            if session["timer"] is not None:
+                session["timer"].cancel()
+                session["timer"] = None
+            old = session["conn"]
+            if old is not None and old is not conn:
+                _drop(old)
+            previous = clients.get(conn, {}).get("session")
+            if previous != token:
+                _end_session(previous)
+            _drop(conn)
+            nick = session["nick"]
+            session["conn"] = conn
+            clients[conn] = {"nick": nick, "session": token}
+            nick_index[nick] = conn
+    if session is not None:
+        if old is not None and old is not conn:
+            # conexión medio abierta que el cliente ya dio por perdida
+            try:
+                old.close()
+            except:
+                pass
+        return nick, token, True
+
+    nick = register_nick(conn, wanted)
+    token = secrets.token_hex(16)
+    if SHARD is not None:
+        # el prefijo dice qué worker guarda la sesión (ver Shard.token_owner)
+        token = f"{SHARD.index}.{token}"
+    with clients_lock:
+        sessions[token] = {"nick": nick, "conn": conn, "timer": None}
+        session_of[nick] = token
+        if conn in clients:
+            clients[conn]["session"] = token
+    return nick, token, False
+
+
+def _expire_session(token):
+    with clients_lock:
+        session = sessions.get(token)
+        if session is None or session["conn"] is not None:
+            return
+        _end_session(token)
+    nick = session["nick"]
+    lobby_broadcast({"type": "info", "text": f"{nick} salió"})
+    rooms.leave(nick)
+
+
+def lobby_broadcast(obj):
+    # avisos y chat del vestíbulo: a todos los clientes de todos los workers
+    broadcast(obj)
+    if SHARD is not None:
+        SHARD.publish(obj)
+
+
+def list_rooms():
+    local = rooms.list_rooms()
+    if SHARD is None:
+        return local
+    return SHARD.list_rooms(local)
 
 
 def broadcast(obj, omit_sock=None):
-    data = (json.dumps(obj) + "\n").encode("utf-8")
+    cache = {}
     with clients_lock:
         for s in list(clients.keys()):
             if s is omit_sock:
                 continue
-            try:
-                s.sendall(data)
-            except:
-                try:
-                    s.close()
-                except:
-                    pass
-                clients.pop(s, None)
+            _send(s, obj, cache)
+
+
+def broadcast_to(nicks, obj):
+    cache = {}
+    with clients_lock:
+        for nick in nicks:
+            s = nick_index.get(nick)
+            if s is not None:
+                _send(s, obj, cache)
 
 
 def send_to_nick(nick, obj):
     with clients_lock:
-        for s, info in list(clients.items()):
-            if info.get("nick") == nick:
+        s = nick_index.get(nick)
+        if s is not None:
+            _send(s, obj, {})
+
+
+def handle_message(conn, nick, msg):
+    # Procesa un mensaje ya decodificado; devuelve el nick (puede cambiar
+    # con "hello"). Compartido por los modos con hilos y asyncio.
+    conn.last_seen = time.monotonic()
+    mtype = msg.get("type")
+
+    if mtype == "hello":
+        if conn.codec is JSON and _as_int(msg.get("proto")) >= BINARY_VERSION:
+            # La confirmación va en JSON y antes de registrar el nick, así
+            # ningún broadcast puede colarse entre ella y el cambio de códec
+            conn.sendall(JSON.encode({"type": "proto", "version": PROTOCOL_VERSION}))
+            conn.codec = BINARY
+        if SHARD is not None:
+            owner = SHARD.token_owner(msg.get("session"))
+            if owner is not None and owner != SHARD.index:
+                # la sesión vive en otro worker: el hello se repite allí
+                SHARD.hand_over(conn, owner, msg)
+                return nick
+        with clients_lock:
+            current = clients.get(conn) or {}
+        if current.get("nick") and msg.get("session") != current.get("session"):
+            # segundo hello en una conexión ya registrada: el nick anterior
+            # queda libre, así que antes se deja su asiento
+            rooms.leave(current["nick"])
+        wanted = msg.get("nick", nick)
+        nick, token, resumed = open_session(conn, msg.get("session"), wanted)
+        send_to_nick(nick, {
+            "type": "session", "token": token, "nick": nick, "resumed": resumed,
+        })
+        if resumed:
+            lobby_broadcast({"type": "info", "text": f"{nick} se ha reconectado"})
+            room = rooms.room_of(nick)
+            if room is not None:
+                room.resume_player(nick)
+        else:
+            if nick != wanted:
+                send_to_nick(nick, {
+                    "type": "info",
+                    "text": f"El nick {wanted} ya está en uso; ahora eres {nick}.",
+                })
+            lobby_broadcast({"type": "info", "text": f"{nick} se ha conectado"})
+        send_to_nick(nick, {"type": "rooms", "rooms": list_rooms()})
+
+    elif mtype == "bye":
+        # salida voluntaria: sin periodo de gracia
+        with clients_lock:
+            _end_session(clients.get(conn, {}).get("session"))
+
+    elif mtype == "ping":
+        send_to_nick(nick, {"type": "pong"})
+
+    elif mtype == "chat":
+        text = msg.get("msg", "")
+        lobby_broadcast({"type": "chat", "from": nick, "msg": text})
+
+    elif mtype == "list_rooms":
+        send_to_nick(nick, {"type": "rooms", "rooms": list_rooms()})
+
+    elif mtype == "join_game":
+        if SHARD is not None and SHARD.route_join(conn, nick, msg):
+            return nick
+        room = rooms.join(nick, msg.get("room"))
+        if room is None:
+            send_to_nick(nick, {
+                "type": "info",
+                "text": "Esa mesa no existe o está llena.",
+            })
+            return nick
+        room.broadcast({
+            "type": "info",
+            "text": f"{nick} se ha unido a la mesa {room.room_id}.",
+        })
+
+    elif mtype == "resync":
+        room = rooms.room_of(nick)
+        if room is not None:
+            with room.lock:
+                send_to_nick(nick, room.to_state_dict())
+
+    elif mtype == "draw":
+        indices = msg.get("cards", [])
+        room = rooms.room_of(nick)
+        if room is not None:
+            room.player_draw(nick, indices)
+
+    return nick
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def client_disconnected(conn, nick):
+    print("Cliente desconectado", nick)
+    with clients_lock:
+        connections.discard(conn)
+        token = (clients.get(conn) or {}).get("session")
+        session = sessions.get(token)
+        if session is not None and session["conn"] is conn:
+            # conserva asiento y mano; _expire_session hace la salida real
+            session["conn"] = None
+            if SESSION_GRACE > 0:
+                session["timer"] = call_later(SESSION_GRACE, _expire_session, token)
+        # otra conexión ya reanudó la sesión de este nick: esta solo se cierra
+        current = sessions.get(session_of.get(nick))
+        replaced = current is not None and current is not session
+        _drop(conn)
+    try:
+        conn.close()
+    except:
+        pass
+    if replaced:
+        return
+    if session is not None and session["conn"] is None:
+        if SESSION_GRACE > 0:
+            lobby_broadcast({"type": "info", "text": f"{nick} perdió la conexión"})
+        else:
+            _expire_session(token)
+        return
+    lobby_broadcast({"type": "info", "text": f"{nick} salió"})
+    rooms.leave(nick)
+
+
+def _track(conn):
+    conn.last_seen = time.monotonic()
+    with clients_lock:
+        connections.add(conn)
+
+
+def _heartbeat():
+    # Corre cada HEARTBEAT_INTERVAL (hilo temporizador o bucle asyncio):
+    # pide señales de vida a los callados y cierra a los que no responden.
+    # Al cerrar, el lector de esa conexión termina y hace la limpieza.
+    now = time.monotonic()
+    ping = {codec: codec.encode({"type": "ping"}) for codec in (JSON, BINARY)}
+    with clients_lock:
+        quiet = [
+            (c, clients.get(c, {}).get("nick"))
+            for c in connections if now - c.last_seen >= HEARTBEAT_INTERVAL
+        ]
+    for conn, nick in quiet:
+        try:
+            if now - conn.last_seen >= IDLE_TIMEOUT:
+                print("Sin respuesta, se cierra", nick)
+                conn.close()
+            else:
+                conn.sendall(ping[conn.codec])
+        except OSError:
+            conn.close()
+    call_later(HEARTBEAT_INTERVAL, _heartbeat)
+
+
+def outbox_metrics():
+    # profundidad de la cola de salida de cada cliente identificado
+    with clients_lock:
+        return {info["nick"]: conn.metrics() for conn, info in clients.items()}
+
+
+def _stats_loop(interval):
+    while True:
+        time.sleep(interval)
+        metrics = outbox_metrics()
+        if not metrics:
+            continue
+        depths = sorted(metrics.items(), key=lambda x: -x[1]["depth"])
+        total = sum(m["depth"] for m in metrics.values())
+        top = ", ".join(f"{n}={m['depth']}" for n, m in depths[:5])
+        print(f"[colas] clientes={len(metrics)} pendientes={total} mayores: {top}")
+
+
+# ---------- Modo con hilos (lector + escritor por conexión) ----------
+class ThreadedConnection:
+    # Envuelve el socket con una cola de salida propia que vacía un hilo
+    # escritor: broadcast/send_to_nick solo encolan y nunca se bloquean
+    # con un cliente lento. Por encima de high_water se deja de leer de
+    # ese cliente (throttle) y al llegar a maxsize se le desconecta.
+    def __init__(self, sock, maxsize=OUTBOX_SIZE, high_water=OUTBOX_HIGH_WATER):
+        self.sock = sock
+        self.codec = JSON
+        self.outbox = queue.Queue()
+        self.maxsize = maxsize
+        self.high_water = high_water
+        self.closed = False
+        self.writable = threading.Event()
+        self.writable.set()
+        self.max_depth = 0
+        self.sent = 0
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+
+    @property
+    def depth(self):
+        return self.outbox.qsize()
+
+    def metrics(self):
+        return {"depth": self.depth, "max_depth": self.max_depth, "sent": self.sent}
+
+    def sendall(self, data):
+        if self.closed:
+            raise OSError("conexión cerrada")
+        depth = self.outbox.qsize()
+        if depth >= self.maxsize:
+            raise OSError("cola de salida llena")
+        self.outbox.put_nowait(data)
+        self.max_depth = max(self.max_depth, depth + 1)
+
+    def throttle(self):
+        while not self.closed and self.outbox.qsize() >= self.high_water:
+            self.writable.clear()
+            self.writable.wait(0.5)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.outbox.put_nowait(None)
+        self.writable.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _writer_loop(self):
+        while True:
+            chunks = [self.outbox.get()]
+            # agrupa lo que ya esté en cola en un solo sendall
+            while chunks[-1] is not None:
                 try:
-                    s.sendall((json.dumps(obj) + "\n").encode("utf-8"))
-                except:
-                    try:
-                        s.close()
-                    except:
-                        pass
-                    clients.pop(s, None)
-                break
+                    chunks.append(self.outbox.get_nowait())
+                except queue.Empty:
+                    break
+            done = chunks[-1] is None
+            if done:
+                chunks.pop()
+            try:
+                if chunks:
+                    self.sock.sendall(b"".join(chunks))
+            except OSError:
+                self.close()
+                return
+            self.sent += len(chunks)
+            self.writable.set()
+            if done:
+                return
 
 
 def handle_client(sock, addr):
     print("Nuevo cliente", addr)
-    f = sock.makefile("r", encoding="utf-8", newline="\n")
+    # como en asyncio: los mensajes ya se agrupan en el hilo escritor
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    f = sock.makefile("rb")
+    conn = ThreadedConnection(sock)
+    _track(conn)
     nick = f"{addr[0]}:{addr[1]}"
 
     try:
         while True:
+            conn.throttle()
             try:
-                line = f.readline()
-            except (ConnectionResetError, OSError):
+                msg = conn.codec.read(f)
+            except (EOFError, OSError, ValueError):
                 break
 
-            if not line:
-                break
+            if not isinstance(msg, dict):
+                continue
+
+            nick = handle_message(conn, nick, msg)
+
+    finally:
+        client_disconnected(conn, nick)
+
+
+def serve_threaded(host, port):
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind((host, port))
+    srv.listen()
+    print(f"Servidor (hilos) escuchando en {host}:{port}")
+    if IDLE_TIMEOUT > 0:
+        call_later(HEARTBEAT_INTERVAL, _heartbeat)
+
+    while True:
+        sock, addr = srv.accept()
+        t = threading.Thread(target=handle_client, args=(sock, addr), daemon=True)
+        t.start()
+
+
+# ---------- Modo asyncio ----------
+class AsyncConnection:
+    # Equivalente a ThreadedConnection dentro del bucle de eventos: una
+    # tarea propia vacía la cola, con el mismo límite y la misma marca alta.
+    def __init__(self, writer, maxsize=OUTBOX_SIZE, high_water=OUTBOX_HIGH_WATER):
+        self.writer = writer
+        self.codec = JSON
+        self.outbox = asyncio.Queue()
+        self.maxsize = maxsize
+        self.high_water = high_water
+        self.closed = False
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.max_depth = 0
+        self.sent = 0
+        self.task = None
+        self.handover = None  # (worker, mensaje) si pasa a otro worker
+
+    @property
+    def depth(self):
+        return self.outbox.qsize()
+
+    def metrics(self):
+        return {"depth": self.depth, "max_depth": self.max_depth, "sent": self.sent}
+
+    def sendall(self, data):
+        if self.closed:
+            raise OSError("conexión cerrada")
+        depth = self.outbox.qsize()
+        if depth >= self.maxsize:
+            raise OSError("cola de salida llena")
+        self.outbox.put_nowait(data)
+        self.max_depth = max(self.max_depth, depth + 1)
+
+    async def throttle(self):
+        if self.closed or self.outbox.qsize() < self.high_water:
+            return
+        # Mientras se espera no se lee del socket: así lo recibido y aún
+        # sin procesar sigue entero en el StreamBuffer (ver más abajo)
+        transport = self.writer.transport
+        transport.pause_reading()
+        try:
+            while not self.closed and self.outbox.qsize() >= self.high_water:
+                self.writable.clear()
+                await self.writable.wait()
+        finally:
+            if not self.closed:
+                transport.resume_reading()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.writable.set()
+        if self.task is not None:
+            self.task.cancel()
+        # abort: no esperar a vaciar el búfer de un cliente que no lee
+        self.writer.transport.abort()
+
+    async def detach(self):
+        # Antes de pasar el socket a otro worker: escribe todo lo pendiente
+        # (cola y búfer del transporte) sin cerrar la conexión, para que
+        # ningún mensaje de este worker llegue después de los del nuevo.
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        while not self.outbox.empty():
+            self.writer.write(self.outbox.get_nowait())
+        self.writer.transport.set_write_buffer_limits(0)
+        await asyncio.wait_for(self.writer.drain(), HANDOVER_TIMEOUT)
+
+    async def writer_loop(self):
+        try:
+            while True:
+                data = await self.outbox.get()
+                transport = self.writer.transport
+                if transport.is_closing():
+                    self.close()
+                    return
+                self.writer.write(data)
+                n = 1
+                # agrupa lo que ya esté en cola antes de esperar al socket,
+                # sin dejar que el búfer del transporte crezca sin límite
+                while (
+                    not self.outbox.empty()
+                    and transport.get_write_buffer_size() < WRITE_CHUNK
+                    and not transport.is_closing()
+                ):
+                    self.writer.write(self.outbox.get_nowait())
+                    n += 1
+                await self.writer.drain()
+                self.sent += n
+                self.writable.set()
+        except (ConnectionError, OSError):
+            self.close()
+
+
+class StreamBuffer:
+    # Lector con búfer propio sobre un StreamReader, con la interfaz que
+    # usan los códecs (readexactly/readline). Toma de una vez todo lo que
+    # haya llegado, y entre una lectura y la siguiente el transporte no
+    # entrega nada más (el bucle no cede salvo aquí o en throttle, que deja
+    # de leer mientras espera). Así lo leído y aún sin procesar está en
+    # `buffer` y no en el StreamReader: en un traspaso viaja tal cual.
+    READ_CHUNK = 1 << 20
+    LINE_LIMIT = 64 * 1024
+
+    def __init__(self, reader, data=b""):
+        self.reader = reader
+        self.buffer = bytearray(data)
 
+    async def _fill(self):
+        chunk = await self.reader.read(self.READ_CHUNK)
+        if not chunk:
+            raise EOFError
+        self.buffer += chunk
+
+    async def readexactly(self, n):
+        while len(self.buffer) < n:
+            await self._fill()
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    async def readline(self):
+        while True:
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                end += 1
+                break
+            if len(self.buffer) > self.LINE_LIMIT:
+                raise ValueError("línea demasiado larga")
             try:
-                msg = json.loads(line)
-            except json.JSONDecodeError:
-                continue
+                await self._fill()
+            except EOFError:
+                end = len(self.buffer)  # como StreamReader: lo que quede
+                break
+        line = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        return line
 
-            mtype = msg.get("type")
 
-            if mtype == "hello":
-                nick = msg.get("nick", nick)
-                with clients_lock:
-                    clients[sock] = {"nick": nick}
-                broadcast({"type": "info", "text": f"{nick} se ha conectado"})
-                broadcast(game.to_state_dict())
+def _open_async(writer, codec=JSON):
+    conn = AsyncConnection(writer)
+    conn.codec = codec
+    conn.task = asyncio.create_task(conn.writer_loop())
+    _track(conn)
+    return conn
 
-            elif mtype == "chat":
-                text = msg.get("msg", "")
-                broadcast({"type": "chat", "from": nick, "msg": text})
 
-            elif mtype == "join_game":
-                game.add_player(nick)
-                broadcast({
-                    "type": "info",
-                    "text": f"{nick} se ha unido a la mesa de juego.",
-                })
-                broadcast(game.to_state_dict())
+async def handle_client_async(reader, writer):
+    addr = writer.get_extra_info("peername") or ("?", 0)
+    print("Nuevo cliente", addr)
+    conn = _open_async(writer)
+    await _serve_async(conn, StreamBuffer(reader), f"{addr[0]}:{addr[1]}")
 
-            elif mtype == "draw":
-                indices = msg.get("cards", [])
-                game.player_draw(nick, indices)
+
+async def _serve_async(conn, reader, nick, replay=None):
+    # `replay`: mensaje que otro worker ya leyó de esta conexión y que hay
+    # que procesar aquí antes de seguir leyendo
+    handed_over = False
+    try:
+        while True:
+            if replay is not None:
+                msg, replay = replay, None
+            else:
+                await conn.throttle()
+                try:
+                    msg = await conn.codec.read_async(reader)
+                except (EOFError, OSError, ValueError):
+                    break
+
+            if not isinstance(msg, dict):
+                continue
+
+            nick = handle_message(conn, nick, msg)
+            if conn.handover is not None:
+                handed_over = await SHARD.transfer(conn, reader, nick)
+                break
 
     finally:
-        print("Cliente desconectado", nick)
+        if not handed_over:
+            client_disconnected(conn, nick)
+
+
+def _raise_fd_limit():
+    # miles de conexiones inactivas necesitan más descriptores que el
+    # límite blando habitual (1024)
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve_async(host, port):
+    global call_later
+    loop = asyncio.get_running_loop()
+    call_later = loop.call_later
+    _raise_fd_limit()
+    srv = await asyncio.start_server(
+        handle_client_async, host, port, reuse_address=True, backlog=4096,
+        reuse_port=SHARD is not None,
+    )
+    if SHARD is not None:
+        SHARD.start(loop)
+        print(f"Worker {SHARD.index + 1}/{SHARD.count} (asyncio) "
+              f"escuchando en {host}:{port}")
+    else:
+        print(f"Servidor (asyncio) escuchando en {host}:{port}")
+    if IDLE_TIMEOUT > 0:
+        call_later(HEARTBEAT_INTERVAL, _heartbeat)
+    async with srv:
+        await srv.serve_forever()
+
+
+# ---------- Modo multiproceso ----------
+# --workers N arranca N procesos con el modo asyncio que comparten el puerto
+# (SO_REUSEPORT: el núcleo reparte las conexiones nuevas). Cada mesa vive en
+# un único worker, que se deduce de su número (los ids van a saltos de N).
+# Entre workers hay un socket Unix de datagramas por worker, en un
+# directorio temporal, por el que viajan:
+#   lobby      chat y avisos del vestíbulo, para reenviar a sus clientes
+#   directory  resumen de las mesas que cambiaron (agrupado cada
+#              DIRECTORY_INTERVAL), para list_rooms y para buscar sitio
+#   sync       un worker recién arrancado pide el directorio completo
+#   handover   el socket de un cliente (SCM_RIGHTS) con su estado y el
+#              mensaje que lo motivó: al unirse a una mesa de otro worker,
+#              o al reanudar una sesión que guarda otro worker
+# Un jugador se mueve con su conexión; la mesa nunca sale de su worker.
+# Los envíos nunca bloquean el bucle: cada worker destino tiene su cola
+# (hasta IPC_QUEUE datagramas) que se vacía cuando su socket admite más;
+# lo que no cabe se descarta y se cuenta. Un traspaso espera como mucho
+# HANDOVER_TIMEOUT a que el cliente lea lo pendiente; si no, se le corta.
+DIRECTORY_INTERVAL = 0.05
+IPC_QUEUE = 1024
+HANDOVER_TIMEOUT = 5.0
+IPC_MAX_DATAGRAM = 256 * 1024
+
+
+class Shard:
+    def __init__(self, index, count, ipc_dir):
+        self.index = index
+        self.count = count
+        self.ipc_dir = ipc_dir
+        self.directory = {}  # room_id -> resumen, mesas de otros workers
+        self.dirty = {}  # room_id -> resumen (None: cerrada) por anunciar
+        self.handovers = 0
+        self.adopted = 0
+        self.dropped = 0
+        self.loop = None
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path(index))
+        self.sock.setblocking(False)
+        self.peers = {}  # índice -> socket conectado a ese worker
+        self.queues = {i: deque() for i in range(count) if i != index}
+
+    def path(self, index):
+        return os.path.join(self.ipc_dir, f"worker{index}.sock")
+
+    def owner(self, room_id):
+        return (room_id - 1) % self.count
+
+    def token_owner(self, token):
+        # los tokens de sesión llevan delante el worker que los emitió
+        if not isinstance(token, str):
+            return None
+        index, _, _ = token.partition(".")
+        index = _as_int(index)
+        return index if 0 <= index < self.count else None
+
+    def start(self, loop):
+        self.loop = loop
+        loop.add_reader(self.sock.fileno(), self._receive)
+        self._to_peers({"type": "sync", "worker": self.index})
+
+    def _peer(self, index):
+        # Un socket conectado por destino: así add_writer avisa cuando la
+        # cola de recepción de ese worker tiene sitio
+        sock = self.peers.get(index)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.connect(self.path(index))
+            except OSError:
+                sock.close()
+                raise
+            self.peers[index] = sock
+        return sock
+
+    def _drop_ipc(self, index, reason, count=1):
+        # se cuenta todo, pero solo se avisa del primero y luego cada 100
+        before = self.dropped
+        self.dropped += count
+        if before == 0 or before // 100 != self.dropped // 100:
+            print(f"IPC: descartado(s) {count} mensaje(s) para el worker "
+                  f"{index + 1} ({reason}); total {self.dropped}")
+
+    def _send(self, index, obj, fds=(), extra=b""):
+        # Encola el datagrama y lo envía ya si el destino tiene sitio.
+        # Devuelve False si se descartó. Los descriptores se duplican: quien
+        # llama puede cerrar los suyos en cuanto vuelve.
+        pending = self.queues[index]
+        if len(pending) >= IPC_QUEUE:
+            self._drop_ipc(index, "cola llena")
+            return False
+        try:
+            self._peer(index)
+        except OSError:
+            # worker aún sin arrancar (pedirá "sync" al hacerlo) o caído
+            self._drop_ipc(index, "sin conexión")
+            return False
+        pending.append((BINARY.encode(obj) + extra, [os.dup(fd) for fd in fds]))
+        if len(pending) == 1:
+            self._drain(index)
+        return True
+
+    def _drain(self, index):
+        pending = self.queues[index]
+        sock = self.peers.get(index)
+        while pending and sock is not None:
+            data, fds = pending[0]
+            ancillary = []
+            if fds:
+                ancillary.append(
+                    (socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))
+                )
+            try:
+                sock.sendmsg([data], ancillary)
+            except (BlockingIOError, InterruptedError):
+                # cola del destino llena: se sigue cuando haya sitio
+                self.loop.add_writer(sock.fileno(), self._drain, index)
+                return
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    self._drop_ipc(index, "demasiado grande")
+                else:
+                    # el worker ya no escucha: se descarta todo lo pendiente
+                    self.loop.remove_writer(sock.fileno())
+                    sock.close()
+                    del self.peers[index]
+                    sock = None
+                    self._drop_ipc(index, str(e), len(pending))
+                    while pending:
+                        for fd in pending.popleft()[1]:
+                            os.close(fd)
+                    return
+            for fd in pending.popleft()[1]:
+                os.close(fd)
+        if sock is not None:
+            self.loop.remove_writer(sock.fileno())
+
+    def _to_peers(self, obj):
+        for index in self.queues:
+            self._send(index, obj)
+
+    def publish(self, obj):
+        self._to_peers({"type": "lobby", "msg": obj})
+
+    def room_changed(self, room_id, summary):
+        if not self.dirty:
+            call_later(DIRECTORY_INTERVAL, self._flush)
+        self.dirty[room_id] = summary
+
+    def _flush(self):
+        changed, self.dirty = self.dirty, {}
+        self._to_peers({
+            "type": "directory",
+            "rooms": [s for s in changed.values() if s is not None],
+            "closed": [r for r, s in changed.items() if s is None],
+        })
+
+    def list_rooms(self, local):
+        remote = list(self.directory.values())
+        return sorted(local + remote, key=lambda r: r["room"])
+
+    def _is_open(self, summary):
+        return summary["phase"] == "waiting" and len(summary["players"]) < MAX_PLAYERS
+
+    def route_join(self, conn, nick, msg):
+        # Decide dónde se atiende un join_game. Devuelve True si la conexión
+        # pasa a otro worker; False si se resuelve aquí (también cuando la
+        # mesa pedida no existe: rooms.join lo dirá).
+        room_id = msg.get("room")
+        if room_id is not None:
+            room_id = _as_int(room_id)
+            summary = self.directory.get(room_id)
+            if (self.owner(room_id) == self.index or summary is None
+                    or len(summary["players"]) >= MAX_PLAYERS):
+                return False
+        else:
+            # primero lo local (sin traspaso): su mesa actual o una abierta
+            if rooms.room_of(nick) is not None or rooms.open_room() is not None:
+                return False
+            room_id = next(
+                (r for r, s in self.directory.items() if self._is_open(s)), None
+            )
+            if room_id is None:
+                return False
+        self.hand_over(conn, self.owner(room_id), dict(msg, room=room_id))
+        return True
+
+    def hand_over(self, conn, index, msg):
+        # deja de leer ya: lo que llegue después lo leerá el otro worker
+        conn.writer.transport.pause_reading()
+        conn.handover = (index, msg)
+
+    async def transfer(self, conn, reader, nick):
+        index, msg = conn.handover
         with clients_lock:
-            clients.pop(sock, None)
+            connections.discard(conn)
+            info = clients.get(conn)
+            if info is not None:
+                _end_session(info.get("session"))
+            _drop(conn)
+        if info is not None:
+            rooms.leave(nick)
+        state = {
+            "type": "handover",
+            "nick": nick,
+            "registered": info is not None,
+            "version": conn.codec.version,
+            "msg": msg,
+        }
+        try:
+            await conn.detach()
+            # lo ya leído del socket pero aún sin procesar viaja detrás
+            pending = bytes(reader.buffer)
+            fd = conn.writer.get_extra_info("socket").fileno()
+            if not self._send(index, state, [fd], pending):
+                raise OSError("el worker no acepta el traspaso")
+        except asyncio.TimeoutError:
+            print(f"No se pudo pasar {nick} al worker {index + 1}: "
+                  f"no lee lo pendiente")
+            conn.writer.transport.abort()
+            return False
+        except (OSError, ValueError) as e:
+            print(f"No se pudo pasar {nick} al worker {index + 1}: {e}")
+            # detach ya marcó la conexión como cerrada: close() no haría nada
+            conn.writer.transport.abort()
+            return False
+        # el otro worker tiene su propio descriptor: cerrar este no corta
+        conn.writer.transport.abort()
+        self.handovers += 1
+        return True
+
+    def _receive(self):
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(self.sock, IPC_MAX_DATAGRAM, 1)
+            except (BlockingIOError, InterruptedError):
+                return
+            buf = io.BytesIO(data)
+            try:
+                msg = BINARY.read(buf)
+            except (EOFError, ValueError):
+                for fd in fds:
+                    os.close(fd)
+                continue
+            mtype = msg.get("type")
+            if mtype == "handover" and fds:
+                asyncio.create_task(self._adopt(fds[0], msg, buf.read()))
+            elif mtype == "lobby":
+                broadcast(msg["msg"])
+            elif mtype == "directory":
+                for room_id in msg["closed"]:
+                    self.directory.pop(room_id, None)
+                for summary in msg["rooms"]:
+                    self.directory[summary["room"]] = summary
+            elif mtype == "sync" and msg["worker"] in self.queues:
+                self._send(msg["worker"], {
+                    "type": "directory", "rooms": rooms.list_rooms(), "closed": [],
+                })
+
+    async def _adopt(self, fd, state, pending):
+        sock = socket.socket(fileno=fd)
         try:
+            reader, writer = await asyncio.open_connection(sock=sock)
+        except OSError:
             sock.close()
-        except:
-            pass
-        broadcast({"type": "info", "text": f"{nick} salió"})
-        game.remove_player(nick)
+            return
+        conn = _open_async(writer, CODECS[state["version"]])
+        nick = state["nick"]
+        self.adopted += 1
+        if state["registered"]:
+            # sesión nueva en este worker; el cliente guarda el token nuevo
+            nick, token, _ = open_session(conn, None, nick)
+            send_to_nick(nick, {
+                "type": "session", "token": token, "nick": nick, "resumed": False,
+            })
+        await _serve_async(conn, StreamBuffer(reader, pending), nick,
+                           replay=state["msg"])
+
+
+def serve_sharded(workers):
+    # Proceso supervisor: lanza los workers (este mismo script con
+    # --shard) y los para todos si uno termina o llega una señal
+    ipc_dir = tempfile.mkdtemp(prefix="poker-shards-")
+    args = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:]
+    procs = [
+        subprocess.Popen(args + ["--shard", f"{i}/{workers}", "--ipc-dir", ipc_dir])
+        for i in range(workers)
+    ]
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    code = 0
+    try:
+        while all(p.poll() is None for p in procs):
+            time.sleep(0.5)
+        code = next(p.returncode for p in procs if p.returncode is not None)
+        print(f"Un worker terminó (código {code}); se paran los demás")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            p.wait()
+        for name in os.listdir(ipc_dir):
+            os.remove(os.path.join(ipc_dir, name))
+        os.rmdir(ipc_dir)
+    sys.exit(code)
 
 
 def main():
-    HOST, PORT = "0.0.0.0", 5000
-    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    srv.bind((HOST, PORT))
-    srv.listen()
-    print(f"Servidor escuchando en {HOST}:{PORT}")
+    global SESSION_GRACE, HEARTBEAT_INTERVAL, IDLE_TIMEOUT, DRAW_TIMEOUT
+    global RNG_SEED, SECURE_RNG, DECK_POOL, SHARD, HISTORY
+    parser = argparse.ArgumentParser(description="Servidor de Póker Simplificado")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument(
+        "--mode", choices=("async", "threaded"), default="async",
+        help="async: asyncio; threaded: hilos lector/escritor por cliente",
+    )
+    parser.add_argument(
+        "--stats", type=float, default=0, metavar="SEG",
+        help="imprime la profundidad de las colas de salida cada SEG segundos",
+    )
+    parser.add_argument(
+        "--grace", type=float, default=SESSION_GRACE, metavar="SEG",
+        help="segundos que se guarda el asiento de un jugador desconectado",
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=IDLE_TIMEOUT, metavar="SEG",
+        help="cierra conexiones sin actividad ni pong en SEG segundos (0: nunca)",
+    )
+    parser.add_argument(
+        "--draw-timeout", type=float, default=DRAW_TIMEOUT, metavar="SEG",
+        help="plazo para cambiar cartas; al vencer se planta a los que falten",
+    )
+    parser.add_argument(
+        "--seed", help="semilla para barajar de forma reproducible (pruebas)",
+    )
+    parser.add_argument(
+        "--secure-rng", action="store_true",
+        help="baraja con el generador criptográfico del sistema",
+    )
+    parser.add_argument(
+        "--deck-pool", type=int, default=0, metavar="N",
+        help="mantiene N mazos barajados por adelantado en segundo plano",
+    )
+    parser.add_argument(
+        "--history", metavar="DIR",
+        help="guarda cada ronda en el historial de manos de DIR",
+    )
+    parser.add_argument(
+        "--history-max-mb", type=float, default=64, metavar="MB",
+        help="tamaño al que rota cada segmento del historial",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, metavar="N",
+        help="N procesos asyncio compartiendo el puerto (SO_REUSEPORT)",
+    )
+    # internos: los pone el supervisor al lanzar cada worker
+    parser.add_argument("--shard", help=argparse.SUPPRESS)
+    parser.add_argument("--ipc-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
 
-    while True:
-        sock, addr = srv.accept()
-        t = threading.Thread(target=handle_client, args=(sock, addr), daemon=True)
-        t.start()
+    if args.workers > 1 and not args.shard:
+        if args.mode != "async":
+            parser.error("--workers solo funciona con --mode async")
+        if not hasattr(socket, "SO_REUSEPORT") or not hasattr(socket, "send_fds"):
+            parser.error("--workers necesita SO_REUSEPORT y sockets Unix")
+        serve_sharded(args.workers)
+        return
+    if args.shard:
+        index, _, count = args.shard.partition("/")
+        SHARD = Shard(int(index), int(count), args.ipc_dir)
+        rooms.next_id = SHARD.index + 1
+        rooms.step = SHARD.count
+        # Ctrl+C llega a todo el grupo: el supervisor se encarga de parar
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    RNG_SEED = args.seed
+    SECURE_RNG = args.secure_rng
+    if args.deck_pool > 0:
+        seed = None if args.seed is None else f"{args.seed}:pool"
+        if SHARD is not None:
+            seed = None if seed is None else f"{seed}:{SHARD.index}"
+        DECK_POOL = DeckPool(make_rng(seed, SECURE_RNG), size=args.deck_pool)
+    if args.history:
+        HISTORY = HandHistory(
+            args.history, max_bytes=int(args.history_max_mb * 1024 * 1024)
+        )
+        # al parar (Ctrl+C o SIGTERM) se escribe lo que quede en cola
+        atexit.register(HISTORY.close)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    SESSION_GRACE = args.grace
+    IDLE_TIMEOUT = args.idle_timeout
+    if IDLE_TIMEOUT > 0:
+        HEARTBEAT_INTERVAL = min(HEARTBEAT_INTERVAL, IDLE_TIMEOUT / 3)
+    DRAW_TIMEOUT = args.draw_timeout
+
+    if args.stats > 0:
+        threading.Thread(target=_stats_loop, args=(args.stats,), daemon=True).start()
+
+    if args.mode == "threaded":
+        serve_threaded(args.host, args.port)
+    else:
+        asyncio.run(serve_async(args.host, args.port))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()